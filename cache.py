@@ -0,0 +1,157 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+
+class CompilationCache:
+    """
+        persistent content-addressed storage for compiled binaries,
+        key is hash of source (with local includes), compiler and its command line
+    """
+    VERSION = 2  # layout of entries, older entries are just never found
+    ENVIRONMENT = ['CLASSPATH', 'CPATH', 'C_INCLUDE_PATH', 'CPLUS_INCLUDE_PATH', 'LIBRARY_PATH']
+
+    def __init__ ( self, directory, *, size ):
+        self.__directory = directory
+        self.__size = size
+        self.__total = None  # cache size: exact after evict, plus what's stored since
+        self.__lock = threading.Lock ()
+
+    def __includes ( self, path, paths ):
+        """ path itself and all files reachable by #include from path """
+        queue = [path]
+        for path in queue:
+            try:
+                with open (path, 'rb') as f:
+                    data = f.read ()
+            except OSError:
+                continue
+            for name in re.findall (rb'^\s*#\s*include\s*["<]([^">]+)[">]', data, re.MULTILINE):
+                name = name.decode ('utf8', 'replace')
+                for directory in [os.path.dirname (path)] + paths:
+                    candidate = os.path.normpath (os.path.join (directory, name))
+                    if os.path.isfile (candidate):
+                        if candidate not in queue:
+                            queue.append (candidate)
+                        break
+        return queue
+
+    def key ( self, compiler, source, binary, command, directory=None ):
+        location = lambda path: path if directory is None else os.path.join (directory, path)
+        # paths differ from problem to problem, while binary doesn't depend on them
+        command = [
+            x.replace (source.path, '<source>').replace (binary, '<binary>')
+                .replace (os.path.dirname (source.path) or '.', '<directory>')
+            for x in command
+        ]
+        paths = [x[2:] for x in command if x.startswith ('-I') and len (x) > 2]
+        paths += [y for x, y in zip (command, command[1:]) if x == '-I']
+        key = hashlib.sha256 ()
+        def feed ( value ):
+            nonlocal key
+            key.update (value if type (value) is bytes else str (value).encode ('utf8'))
+            key.update (b'\0')
+        feed (CompilationCache.VERSION)
+        feed (compiler)
+        for x in command:
+            feed (x)
+        executable = shutil.which (command[0])
+        if executable is not None:
+            stat = os.stat (executable)
+            feed ('%s %d %d' % (executable, stat.st_size, stat.st_mtime_ns))
+        for name in CompilationCache.ENVIRONMENT:
+            feed ('%s=%s' % (name, os.environ.get (name, '')))
+        for path in self.__includes (location (source.path), paths):
+            with open (path, 'rb') as f:
+                feed (f.read ())
+        return key.hexdigest ()
+
+    def __entry ( self, key ):
+        return os.path.join (self.__directory, key[:2], key)
+
+    def load ( self, key, binary, directory=None ):
+        """ copy cached artifacts next to binary, returns False if there is no such entry """
+        entry = self.__entry (key)
+        target = os.path.dirname (binary if directory is None else os.path.join (directory, binary))
+        try:
+            for name in os.listdir (entry):
+                # same source under other name has same key, so names are kept relative to binary
+                restored = name.replace ('<binary>', os.path.basename (binary))
+                shutil.copy (os.path.join (entry, name), os.path.join (target, restored))
+            os.utime (entry)  # mtime of entry is its last use
+        except OSError:
+            return False
+        return True
+
+    def store ( self, key, binary, artifacts, directory=None ):
+        """ save artifacts, all of them are expected to lie in one directory with binary """
+        entry = self.__entry (key)
+        if os.path.isdir (entry):
+            return
+        os.makedirs (os.path.dirname (entry), exist_ok=True)
+        temporary = None
+        try:
+            # unique for every store: other threads and processes may store same key at once
+            temporary = tempfile.mkdtemp (
+                prefix=os.path.basename (entry) + '.', dir=os.path.dirname (entry)
+            )
+            for path in artifacts:
+                name = os.path.basename (path).replace (os.path.basename (binary), '<binary>')
+                source = path if directory is None else os.path.join (directory, path)
+                shutil.copy (source, os.path.join (temporary, name))
+            size = sum (x.stat ().st_size for x in os.scandir (temporary))
+            os.rename (temporary, entry)
+        except OSError:  # somebody else stored it first, or artifacts are missing
+            if temporary is not None:
+                shutil.rmtree (temporary, ignore_errors=True)
+            return
+        with self.__lock:
+            # full scan once per process, later only when estimate says cache is too large
+            if self.__total is not None:
+                self.__total += size
+                if self.__total <= self.__size:
+                    return
+            self.evict ()
+
+    def evict ( self ):
+        """ remove least recently used entries while cache is larger than allowed """
+        entries = []
+        total = 0
+        for bucket in os.scandir (self.__directory):
+            if not bucket.is_dir ():
+                continue
+            for entry in os.scandir (bucket.path):
+                try:
+                    size = sum (x.stat ().st_size for x in os.scandir (entry.path))
+                    entries.append ((entry.stat ().st_mtime, size, entry.path))
+                except OSError:  # removed by concurrent t.py
+                    continue
+                total += size
+        for mtime, size, path in sorted (entries):
+            if total <= self.__size:
+                break
+            shutil.rmtree (path, ignore_errors=True)
+            total -= size
+        self.__total = total
@@ -19,11 +19,185 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import os
+import select
+import subprocess
+import threading
+import time
+
+from invoker import RunResult
 from source import Source
+from tlib import Module
 
 
 class Checker (Source):
-    def __init__ ( self, *args, **kwargs ):
+    def __init__ ( self, *args, builtin=None, **kwargs ):
+        """ builtin: function (input, output, answer) -> (exit code, comment), no process """
         super (Checker, self).__init__ (*args, **kwargs)
+        self.__builtin = builtin
+
+    builtin = property (lambda self: self.__builtin)
+
+    def compile ( self, **kwargs ):
+        if self.__builtin is None:
+            super (Checker, self).compile (**kwargs)
+
+    def run ( self, arguments=[], **kwargs ):
+        if self.__builtin is None:
+            return super (Checker, self).run (arguments, **kwargs)
+        start = time.time ()
+        code, comment = self.__builtin (*arguments)
+        return RunResult.exitCode (
+            code, peak_time=time.time () - start, peak_memory=0,
+            outputs=(b'', comment.encode ('utf8'))
+        )
+
+
+class CheckerServer:
+    """
+        checker started once for many checks: it's run as `checker --server` and greets
+        with HELLO line, then for every request line `input<TAB>output<TAB>answer` it replies
+        with line `exitcode length` followed by comment of that length in bytes
+        (exit codes are usual: 0 ok, 1 wa, 2 pe, 3 fail)
+    """
+    HELLO = b't.py checker 1\n'
+    TIMEOUT = 10.0  # for greeting (jvm may be slow to start) and for every reply
+
+    def __init__ ( self, arguments, directory=None ):
+        self.__process = subprocess.Popen (
+            arguments + ['--server'], cwd=directory, bufsize=0,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self.__buffer = b''
+        # ordinary checker may wait for anything, so don't wait for its greeting forever
+        try:
+            hello = self.__read (CheckerServer.__line, time.time () + CheckerServer.TIMEOUT)
+        except OSError:
+            hello = None
+        if hello != CheckerServer.HELLO:
+            self.close ()
+            raise OSError ("checker doesn't speak protocol")
+
+    @staticmethod
+    def __line ( buffer ):
+        return buffer.index (b'\n') + 1 if b'\n' in buffer else None
+
+    def __read ( self, ready, deadline ):
+        """
+            read from checker until ready (buffer) gives size of complete reply;
+            checker which hangs is killed, so it's never waited for forever
+        """
+        fd = self.__process.stdout.fileno ()
+        while True:
+            size = ready (self.__buffer)
+            if size is not None:
+                data, self.__buffer = self.__buffer[:size], self.__buffer[size:]
+                return data
+            timeout = deadline - time.time ()
+            if timeout <= 0 or not select.select ([fd], [], [], timeout)[0]:
+                self.__process.kill ()
+                raise OSError ("no reply from checker in %.0fs" % CheckerServer.TIMEOUT)
+            chunk = os.read (fd, 1 << 16)
+            if not chunk:
+                raise OSError ("checker has gone")
+            self.__buffer += chunk
+
+    def check ( self, input, output, answer ):
+        start = time.time ()
+        deadline = start + CheckerServer.TIMEOUT
+        self.__process.stdin.write (('%s\t%s\t%s\n' % (input, output, answer)).encode ('utf8'))
+        try:
+            code, length = map (int, self.__read (CheckerServer.__line, deadline).split ())
+            if length < 0:
+                raise ValueError (length)
+        except ValueError:
+            raise OSError ("bad reply from checker") from None
+        comment = self.__read (lambda buffer: length if len (buffer) >= length else None, deadline)
+        return RunResult.exitCode (
+            code, peak_time=time.time () - start, peak_memory=0, outputs=(b'', comment)
+        )
+
+    def close ( self ):
+        for stream in self.__process.stdin, self.__process.stdout:
+            try:
+                stream.close ()
+            except OSError:
+                pass
+        try:
+            self.__process.wait (1.0)
+        except subprocess.TimeoutExpired:
+            self.__process.kill ()
+            self.__process.wait ()
+
+
+class CheckerSession (Module):
+    """
+        many checks in a row; with server enabled every thread gets its own CheckerServer,
+        checkers which don't speak protocol (or fail in the middle) are spawned for every check
+    """
+    def __init__ ( self, checker, *args, server=False, **kwargs ):
+        super (CheckerSession, self).__init__ (*args, **kwargs)
+        self.__checker = checker
+        self.__server = server
+        self.__lock = threading.Lock ()
+        self.__idle = []
+        self.__servers = []
+
+    def __acquire ( self ):
+        with self.__lock:
+            if not self.__server or getattr (self.__checker, 'builtin', None) is not None:
+                return None
+            if self.__idle:
+                return self.__idle.pop ()
+        if isinstance (self.__checker, Source):
+            arguments, directory = self.__checker.executable.arguments, self.__checker.directory
+        else:
+            arguments, directory = self.__checker.arguments, None
+        try:
+            server = CheckerServer (arguments, directory)
+        except OSError:
+            self.__disable (
+                "checker %s doesn't support server protocol, it's started for every test"
+                % self.__checker
+            )
+            return None
+        with self.__lock:
+            self.__servers.append (server)
+        return server
+
+    def __disable ( self, message ):
+        with self.__lock:
+            if not self.__server:
+                return
+            self.__server = False
+        self._log.notice (message)
+
+    def check ( self, input, output, answer ):
+        """ result of checker on test, comment is in stderr of result """
+        server = self.__acquire ()
+        if server is not None:
+            try:
+                result = server.check (*[os.path.abspath (x) for x in (input, output, answer)])
+            except OSError as error:
+                self.__disable (
+                    "checker server failed (%s), checker is started for every test" % error
+                )
+            else:
+                with self.__lock:
+                    self.__idle.append (server)
+                return result
+        return self.__checker.run ([input, output, answer], stderr=subprocess.PIPE)
+
+    def close ( self ):
+        with self.__lock:
+            servers, self.__servers, self.__idle = self.__servers, [], []
+        for server in servers:
+            server.close ()
+
+    def __enter__ ( self ):
+        return self
+
+    def __exit__ ( self, *exception ):
+        self.close ()
 
 
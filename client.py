@@ -0,0 +1,36 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+#
+#    thin client for `t.py serve`: sends arguments to server and exits with its code,
+#    if server is not running, t.py is executed as usual
+#
+
+import os
+import sys
+
+import server
+
+
+def fallback ( arguments ):
+    path = os.path.join (os.path.dirname (os.path.abspath (__file__)), 't.py')
+    os.execv (sys.executable, [sys.executable, path] + arguments)
+
+
+sys.exit (server.client (sys.argv[1:], fallback=fallback))
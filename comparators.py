@@ -0,0 +1,339 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+#
+#    testlib's standard checkers (wcmp, lcmp, ncmp, rcmp*) run right inside t.py:
+#    every comparator is function (input, output, answer) -> (exit code, comment)
+#    with same codes and comments as original checker
+#
+
+import contextlib
+import math
+import mmap
+import re
+
+OK, WA, PE, FAIL = 0, 1, 2, 3
+
+
+class Quit (Exception):
+    def __init__ ( self, code, comment ):
+        super (Quit, self).__init__ (comment)
+        self.code = code
+        self.comment = comment
+
+
+class Stream:
+    """
+        file read through mmap; tokens are taken by large blocks and converted
+        by whole lists, so python code runs per block rather than per token
+    """
+    BLOCK = 1 << 20
+    SPACE = re.compile (rb'\s*')
+    BREAK = re.compile (rb'\s')
+    SPACES = bytes.maketrans (b'\t\r\n\v\f', b'     ')
+    INTEGER = re.compile (rb'-?(0|[1-9][0-9]*)')
+    REAL = re.compile (rb'[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?')
+
+    def __init__ ( self, data, *, output ):
+        self.__data = data
+        self.__position = 0
+        self.__output = output  # errors in output are PE, errors in answer are FAIL
+
+    def error ( self, comment ):
+        return Quit (PE if self.__output else FAIL, comment)
+
+    def seek_eof ( self ):
+        """ only whitespace is left """
+        self.__position = Stream.SPACE.match (self.__data, self.__position).end ()
+        return self.__position == len (self.__data)
+
+    def eof ( self ):
+        return self.__position == len (self.__data)
+
+    def block ( self ):
+        """ next piece of file, cut at whitespace; empty only at end of file """
+        start = self.__position
+        end = start + Stream.BLOCK
+        if end < len (self.__data):
+            space = Stream.BREAK.search (self.__data, end)  # don't cut token in two
+            end = len (self.__data) if space is None else space.start ()
+        self.__position = min (end, len (self.__data))
+        return self.__data[start:end]
+
+    def tokens ( self, block ):
+        return block.split ()
+
+    def integers ( self, block ):
+        """ tokens checked to be int64, left as bytes: equal numbers have equal tokens """
+        data = b' ' + block.translate (Stream.SPACES)
+        tokens = data.split ()
+        # every check here is done by C code over whole block
+        if (
+            not data.translate (None, b'0123456789- ') and re.search (rb' 0[0-9]', data) is None
+            and data.count (b'-') == data.count (b' -')
+            and b' -0' not in data and b' - ' not in data + b' '
+            and (
+                max (map (len, tokens), default=0) < 19
+                or all (-2**63 <= int (token) < 2**63 for token in tokens)
+            )
+        ):
+            return tokens
+        for token in tokens:  # find out what is wrong
+            if (
+                not Stream.INTEGER.fullmatch (token) or token == b'-0'
+                or not -2**63 <= int (token) < 2**63
+            ):
+                token = compress (token.decode ('utf8', 'replace'))
+                raise self.error ('Expected int64, but "%s" found' % token)
+        raise AssertionError ("bad block of integers")
+
+    def reals ( self, block ):
+        """ values of tokens, which must be reals """
+        tokens = block.split ()
+        # within these characters float () accepts exactly what testlib does
+        if not block.translate (None, b'0123456789.eE+- \t\r\n\v\f'):
+            try:
+                return list (map (float, tokens))
+            except ValueError:
+                pass
+        for token in tokens:
+            if not Stream.REAL.fullmatch (token):
+                token = compress (token.decode ('utf8', 'replace'))
+                raise self.error ('Expected double, but "%s" found' % token)
+        raise AssertionError ("bad block of reals")
+
+    def line ( self ):
+        if self.eof ():
+            raise self.error ("Unexpected end of file - string expected")
+        end = self.__data.find (b'\n', self.__position)
+        if end == -1:
+            end = len (self.__data)
+        line = self.__data[self.__position:end]
+        self.__position = end + 1 if end < len (self.__data) else end
+        return line.rstrip (b'\r').decode ('utf8', 'replace')
+
+
+class Pairs:
+    """
+        equally long lists (found, expected) of values from output and answer,
+        until one of them is over; then rest of the other one is in found or expected
+    """
+    def __init__ ( self, ouf, ans, convert ):
+        self.__ouf = ouf
+        self.__ans = ans
+        self.__convert = convert
+        self.found = []
+        self.expected = []
+
+    def __iter__ ( self ):
+        while True:
+            if not self.found:
+                self.found = self.__convert (self.__ouf, self.__ouf.block ())
+            if not self.expected:
+                self.expected = self.__convert (self.__ans, self.__ans.block ())
+            if not self.found or not self.expected:
+                return
+            k = min (len (self.found), len (self.expected))
+            found, expected = self.found[:k], self.expected[:k]
+            self.found, self.expected = self.found[k:], self.expected[k:]
+            yield found, expected
+
+
+@contextlib.contextmanager
+def stream ( path, *, output ):
+    try:
+        f = open (path, 'rb')
+    except FileNotFoundError:  # solution may write nothing at all
+        if output:
+            raise Quit (PE, 'Output file not found: "%s"' % path) from None
+        raise Quit (FAIL, 'File not found: "%s"' % path) from None
+    with f:
+        try:
+            data = mmap.mmap (f.fileno (), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file can't be mapped
+            yield Stream (b'', output=output)
+            return
+        try:
+            yield Stream (data, output=output)
+        finally:
+            data.close ()
+
+
+def compress ( s ):
+    return s if len (s) <= 64 else s[:30] + '...' + s[-31:]
+
+
+def ending ( n ):
+    if n % 100 // 10 == 1:
+        return 'th'
+    return {1: 'st', 2: 'nd', 3: 'rd'}.get (n % 10, 'th')
+
+
+def differ ( found, expected ):
+    """ index of first difference of lists, which are known to differ """
+    return next (i for i, (x, y) in enumerate (zip (found, expected)) if x != y)
+
+
+def comparator ( function ):
+    """ opens files, turns Quit into result and checks for extra output like testlib does """
+    def compare ( input, output, answer ):
+        try:
+            with stream (output, output=True) as ouf, stream (answer, output=False) as ans:
+                code, comment = function (ouf, ans)
+                if code == OK and not ouf.seek_eof ():
+                    return PE, "Extra information in the output file"
+                return code, comment
+        except Quit as verdict:
+            return verdict.code, verdict.comment
+    return compare
+
+
+@comparator
+def wcmp ( ouf, ans ):
+    n = 0
+    pairs = Pairs (ouf, ans, Stream.tokens)
+    for found, expected in pairs:
+        if found != expected:
+            i = differ (found, expected)
+            j, p = (x[i].decode ('utf8', 'replace') for x in (expected, found))
+            return WA, "%d%s words differ - expected: '%s', found: '%s'" % (
+                n + i + 1, ending (n + i + 1), compress (j), compress (p)
+            )
+        n += len (found)
+        last = expected[-1]
+    if pairs.found:
+        return WA, "Participant output contains extra tokens"
+    if pairs.expected:
+        return WA, "Unexpected EOF in the participants output"
+    return OK, '"%s"' % compress (last.decode ('utf8', 'replace')) if n == 1 else "%d tokens" % n
+
+
+@comparator
+def lcmp ( ouf, ans ):
+    n = 0
+    while not ans.eof ():
+        j = ans.line ()
+        if not j and ans.eof ():
+            break
+        last = j
+        p = ouf.line ()
+        n += 1
+        if j.split () != p.split ():
+            return WA, "%d%s lines differ - expected: '%s', found: '%s'" % (
+                n, ending (n), compress (j), compress (p)
+            )
+    if n == 1:
+        return OK, "single line: '%s'" % compress (last)
+    return OK, "%d lines" % n
+
+
+@comparator
+def ncmp ( ouf, ans ):
+    n = 0
+    first = []
+    pairs = Pairs (ouf, ans, Stream.integers)
+    for found, expected in pairs:
+        if found != expected:
+            i = differ (found, expected)
+            return WA, "%d%s numbers differ - expected: '%d', found: '%d'" % (
+                n + i + 1, ending (n + i + 1), int (expected[i]), int (found[i])
+            )
+        first += [x.decode () for x in expected[:5 - len (first)]]
+        n += len (found)
+    def rest ( stream, values ):
+        count = len (values)
+        while True:
+            values = stream.integers (stream.block ())
+            if not values:
+                return count
+            count += len (values)
+    extra_answer = rest (ans, pairs.expected)
+    extra_output = rest (ouf, pairs.found)
+    if extra_answer:
+        return WA, (
+            "Answer contains longer sequence [length = %d], but output contains %d elements"
+            % (n + extra_answer, n)
+        )
+    if extra_output:
+        return WA, (
+            "Output contains longer sequence [length = %d], but answer contains %d elements"
+            % (n + extra_output, n)
+        )
+    if n <= 5:
+        return OK, '%d number(s): "%s"' % (n, compress (' '.join (first)))
+    return OK, "%d numbers" % n
+
+
+def real_equal ( expected, result, error ):
+    if math.isnan (expected):
+        return math.isnan (result)
+    if math.isinf (expected):
+        return math.isinf (result) and (result > 0) == (expected > 0)
+    if math.isnan (result) or math.isinf (result):
+        return False
+    if abs (result - expected) <= error + 1e-15:
+        return True
+    low, high = sorted ([expected * (1.0 - error), expected * (1.0 + error)])
+    return result + 1e-15 >= low and result <= high + 1e-15
+
+
+def real_delta ( expected, result ):
+    absolute = abs (result - expected)
+    if abs (expected) > 1e-9:
+        return min (absolute, abs (absolute / expected))
+    return absolute
+
+
+def rcmp ( error, digits ):
+    """ comparator of reals with given absolute or relative error """
+    @comparator
+    def compare ( ouf, ans ):
+        n = 0
+        pairs = Pairs (ouf, ans, Stream.reals)
+        for found, expected in pairs:
+            if found != expected:  # equal lists are fine without any arithmetic
+                for i, (p, j) in enumerate (zip (found, expected)):
+                    if not real_equal (j, p, error):
+                        return WA, (
+                            "%d%s numbers differ - expected: '%.*f', found: '%.*f', error = '%.*f'"
+                            % (n + i + 1, ending (n + i + 1), digits, j, digits, p,
+                               digits, real_delta (j, p))
+                        )
+            n += len (found)
+            j, p = expected[-1], found[-1]
+        if pairs.expected:
+            raise ouf.error ("Unexpected end of file - double expected")
+        if pairs.found:
+            return PE, "Extra information in the output file"
+        if n == 1:
+            return OK, "found '%.*f', expected '%.*f', error '%.*f'" % (
+                digits, p, digits, j, digits, real_delta (j, p)
+            )
+        return OK, "%d numbers" % n
+    return compare
+
+
+COMPARATORS = {
+    'wcmp': wcmp,
+    'lcmp': lcmp,
+    'ncmp': ncmp,
+    'rcmp4': rcmp (1e-4, 4),
+    'rcmp6': rcmp (1e-6, 6),
+    'rcmp9': rcmp (1e-9, 10),
+}
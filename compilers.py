@@ -17,6 +17,8 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import subprocess
+
 from tlib import Color, Error, Log, Module
 
 
@@ -32,12 +34,14 @@ class CompilationError (Error):
 class Compiler (Module):
     def __init__ (
         self, name, *args,
-        binary=lambda source: source.path, compile=None, executable, suffixes=[], **kwargs
+        binary=lambda source: source.path, compile=None, executable, suffixes=[],
+        artifacts=lambda source, binary, directory: [binary], **kwargs
     ):
         """
             binary: Source -> binary name
             compile: Source, binary name -> RunResult for compilation
             executable: binary name, Source -> Executable
+            artifacts: Source, binary name, directory -> all files made by compilation
         """
         super (Compiler, self).__init__ (*args, **kwargs)
         self.__name = name
@@ -45,25 +49,76 @@ class Compiler (Module):
         self.__binary = binary
         self.__compile = compile
         self.__executable = executable
+        self.__artifacts = artifacts
 
     name = property (lambda self: self.__name)
     suffixes = property (lambda self: self.__suffixes)
     binary = property (lambda self: self.__binary)
     executable = property (lambda self: self.__executable)
 
-    def __call__ ( self, source, directory=None ):
+    def __call__ ( self, source, directory=None, *, capture=False ):
+        """ capture: collect compiler output and log it at once (for compilation in parallel) """
         binary = self.__binary (source)
         if self.__compile is not None:
             compile, args = self.__compile (source, binary)
-            if self._log.policy is not Log.BRIEF:
-                self._log (
-                    '[compile %s]' % source, Color.DEFAULT, ' $ ' + str (compile) + ' '.join (args)
+            cache = self._configuration.compilation_cache
+            key = None
+            if cache is not None:
+                key = cache.key (self.__name, source, binary, compile.arguments + args, directory)
+                if cache.load (key, binary, directory):
+                    if self._log.policy is not Log.BRIEF:
+                        self._log ('[compile %s]' % source, Color.DEFAULT, ' (cached)')
+                    return self.__executable (binary, source)
+            if capture:
+                result = compile.run (
+                    args, directory=directory, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
                 )
-            result = compile.run (args, directory=directory)
+                if self._log.policy is not Log.BRIEF:
+                    self._log (
+                        '[compile %s]' % source, Color.DEFAULT,
+                        ' $ ' + str (compile) + ' '.join (args),
+                        '\n' if result.stdout else '', result.stdout.rstrip ()
+                    )
+            else:
+                if self._log.policy is not Log.BRIEF:
+                    self._log (
+                        '[compile %s]' % source, Color.DEFAULT,
+                        ' $ ' + str (compile) + ' '.join (args)
+                    )
+                result = compile.run (args, directory=directory)
             if not result:
                 raise self._error (source, cls=CompilationError)
+            if cache is not None:
+                cache.store (key, binary, self.__artifacts (source, binary, directory), directory)
         else:
             assert binary == source.path
         return self.__executable (binary, source)
 
 
+
+
+class Compilers:
+    """
+        compilers by name, every compiler is made by its factory on first use,
+        so only suffixes of compilers are known before that
+    """
+    def __init__ ( self ):
+        self.__factories = {}
+        self.__suffixes = {}
+        self.__compilers = {}
+
+    def register ( self, name, suffixes, factory ):
+        self.__factories[name] = factory
+        self.__suffixes[name] = suffixes
+
+    def suffixes ( self ):
+        """ pairs (compiler name, its suffixes) """
+        return self.__suffixes.items ()
+
+    def __contains__ ( self, name ):
+        return name in self.__factories
+
+    def __getitem__ ( self, name ):
+        if name not in self.__compilers:
+            self.__compilers[name] = self.__factories[name] ()
+        return self.__compilers[name]
@@ -0,0 +1,112 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import json
+import os
+
+
+class Discovery:
+    """
+        fast search of problem directories: every directory is listed once with scandir,
+        only directories which may be problems are shown to caller;
+        listings are cached in index file and reused while directory mtime is the same
+    """
+    PRUNE = {'tests', '.temp', '.git', '.hg', '.svn', 'CVS', '__pycache__'}
+    FILES = {'problem.xml', 'problem.properties', 'makefile'}
+    DIRECTORIES = {'source', 'src', 'tests'}
+
+    def __init__ ( self, index=None, *, jobs=1 ):
+        self.__index_path = index
+        self.__jobs = max (1, jobs)
+        self.__index = {}
+        self.__changed = False
+        if index is not None:
+            try:
+                with open (index, 'r') as f:
+                    self.__index = json.load (f)
+            except (FileNotFoundError, ValueError):
+                pass
+
+    def __list ( self, path ):
+        """ (candidate, subdirectories) for path, None if it's not a directory """
+        key = os.path.abspath (path)
+        try:
+            mtime = os.stat (path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self.__index.get (key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+        candidate = False
+        subdirectories = []
+        try:
+            with os.scandir (path) as entries:
+                for entry in entries:
+                    directory = entry.is_dir ()
+                    if entry.name in Discovery.FILES:
+                        candidate = True
+                    if directory and entry.name in Discovery.DIRECTORIES:
+                        candidate = True
+                    if directory and entry.name not in Discovery.PRUNE:
+                        subdirectories.append (entry.name)
+        except NotADirectoryError:
+            return None
+        subdirectories.sort ()
+        self.__index[key] = [mtime, candidate, subdirectories]
+        self.__changed = True
+        return candidate, subdirectories
+
+    def search ( self, path, accept ):
+        """
+            breadth-first search from path, yields directories which may be problems
+            and where accept (path) is true, doesn't go into such directories;
+            with jobs > 1 each level is listed in parallel
+        """
+        executor = None
+        if self.__jobs > 1:
+            import concurrent.futures  # not needed for single job
+            executor = concurrent.futures.ThreadPoolExecutor (max_workers=self.__jobs)
+        try:
+            level = [path]
+            while level:
+                listings = (map if executor is None else executor.map) (self.__list, level)
+                following = []
+                for path, listing in zip (level, listings):
+                    if listing is None:
+                        continue
+                    candidate, subdirectories = listing
+                    if candidate and accept (path):
+                        yield path
+                        continue
+                    following += [os.path.join (path, x) for x in subdirectories]
+                level = following
+        finally:
+            if executor is not None:
+                executor.shutdown (wait=True, cancel_futures=True)
+            self.save ()
+
+    def save ( self ):
+        if self.__index_path is None or not self.__changed:
+            return
+        os.makedirs (os.path.dirname (self.__index_path), exist_ok=True)
+        temporary = '%s.%d' % (self.__index_path, os.getpid ())
+        with open (temporary, 'w') as f:
+            json.dump (self.__index, f)
+        os.rename (temporary, self.__index_path)
+        self.__changed = False
@@ -11,6 +11,7 @@ class Executable (Module):
         self.__path = path
 
     path = property (lambda self: self.__path)
+    arguments = property (lambda self: self.__arguments)
 
     def __str__ ( self ):
         if self.__source is not None:
@@ -17,12 +17,12 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import contextlib
 import os.path
 import re
 import shutil
 import subprocess
 
-import xml.etree.ElementTree as xml
 
 from tlib import Error, Module
 import compilers
@@ -70,11 +70,13 @@ class Heuristics (Module):
         self.__compiler_suffixes_special = {
             'py': self.__detector_python
         }
-        for compiler in self._compilers.values ():
-            for suffix in compiler.suffixes:
+        for name, suffixes in self._compilers.suffixes ():
+            for suffix in suffixes:
                 if suffix in self.__compiler_suffixes and suffix not in self.__compiler_suffixes_special:
                     raise self._error ("confusing compiler configuration: suffix '%s' has ambiguous compiler" % suffix)
-                self.__compiler_suffixes[suffix] = compiler
+                self.__compiler_suffixes[suffix] = name
+        self.__probed = None
+        self.__listings = None
     
     def __parse_time ( self, value ):
         return float (value)
@@ -102,21 +104,59 @@ class Heuristics (Module):
             # python3 is default
             return 'python3'
 
-    # def __parse_file ( self, value, * ):
-    #     if value in ('<std>', '<stdin>', '<stdout>'):
-    #         return Problem.File.std (t=self)
-    #     return Problem.File.name (value, t=self)
+    def __parse_file ( self, value, std ):
+        if value in ('<std>', str (std)):
+            return std
+        return value
+
+    def __probe ( self, path ):
+        """ remember directory where we looked for something, changes there invalidate cache """
+        if self.__probed is not None:
+            self.__probed.add (os.path.dirname (path) or '.')
+
+    def __listing ( self, directory ):
+        """
+            {name: is directory} for all entries of directory, listed once per problem_open
+            with scandir; None if directory doesn't exist or listings aren't collected now
+        """
+        if self.__listings is None:
+            return None
+        key = os.path.abspath (directory)
+        if key not in self.__listings:
+            try:
+                with os.scandir (key) as entries:
+                    self.__listings[key] = {
+                        entry.name: entry.is_dir () for entry in entries
+                        if entry.is_dir () or entry.is_file ()
+                    }
+            except (FileNotFoundError, NotADirectoryError):
+                self.__listings[key] = {}
+        return self.__listings[key]
+
+    def __isdir ( self, path ):
+        listing = self.__listing (os.path.dirname (path) or '.')
+        if listing is None:
+            return os.path.isdir (path)
+        return listing.get (os.path.basename (path)) is True
+
+    def __isfile ( self, path ):
+        listing = self.__listing (os.path.dirname (path) or '.')
+        if listing is None:
+            return os.path.isfile (path)
+        return listing.get (os.path.basename (path)) is False
 
     def __directory_search_source ( self, path='.' ):
+        self.__probe (os.path.join (path, 'src'))
         for directory in ['source', 'src', 'tests']:
-            if os.path.isdir (os.path.join (path, directory)):
+            if self.__isdir (os.path.join (path, directory)):
                 return directory
         else:
             raise self._error ("source directory", cls=NotFoundError)
 
     def __directory_search_solutions ( self, path='.' ):
+        self.__probe (os.path.join (path, 'solutions'))
         for directory in ['solutions', 'sols']:
-            if os.path.isdir (os.path.join (path, directory)):
+            if self.__isdir (os.path.join (path, directory)):
                 return directory
         return '.'
 
@@ -165,33 +205,42 @@ class Heuristics (Module):
                 pass
         raise self._error ('cleaner', cls=NotFoundError)
 
-    def __garbage_search ( self, path ):
-        directories = [path]
-        garbage_suffixes = {'in', 'out', 'log', 'exe', 'dcu', 'ppu', 'o', 'obj', 'class', 'hi', 'manifest', 'pyc', 'pyo'}
-        garbage_names = {'tests.description', 'tests.gen', 'input', 'output'}
-        for directory in directories:
-            for filename in map (lambda file: os.path.join (directory, file), os.listdir (directory)):
-                if os.path.isdir (filename):
-                    directories.append (filename)
-                    continue
-                nonse, suffix = os.path.splitext (filename)
-                if suffix:
-                    suffix = suffix[1:]
-                if suffix in garbage_suffixes or filename in garbage_names:
-                    yield filename
-
-    def __source_search_all ( self, path ):
-        directories = [path]
-        for directory in directories:
-            for filename in map (lambda file: os.path.join (directory, file), os.listdir (directory)):
-                if os.path.isdir (filename):
-                    directories.append (filename)
+    GARBAGE_SUFFIXES = {
+        'in', 'out', 'log', 'exe', 'dcu', 'ppu', 'o', 'obj', 'class', 'hi', 'manifest', 'pyc', 'pyo'
+    }
+    GARBAGE_NAMES = {'tests.description', 'tests.gen', 'input', 'output'}
+
+    def __files_search ( self, path, directory_tests=None ):
+        """
+            single walk over problem directory, returns (sources, garbage);
+            files in tests directory are never sources, so there we only look for garbage
+        """
+        sources = []
+        garbage = []
+        tests = None
+        if directory_tests is not None:
+            tests = os.path.normpath (os.path.join (path, directory_tests))
+        directories = [(path, False)]
+        for directory, in_tests in directories:
+            in_tests = in_tests or os.path.normpath (directory) == tests
+            try:
+                with os.scandir (directory) as iterator:
+                    entries = list (iterator)
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                filename = os.path.join (directory, entry.name)
+                if entry.is_dir ():
+                    directories.append ((filename, in_tests))
                     continue
-                nonse, suffix = os.path.splitext (filename)
+                nonse, suffix = os.path.splitext (entry.name)
                 if suffix:
                     suffix = suffix[1:]
-                if suffix in self.__compiler_suffixes.keys ():
-                    yield filename
+                if suffix in Heuristics.GARBAGE_SUFFIXES or entry.name in Heuristics.GARBAGE_NAMES:
+                    garbage.append (filename)
+                if not in_tests and suffix in self.__compiler_suffixes.keys ():
+                    sources.append (filename)
+        return sources, garbage
 
     def __source_search ( self, path ):
         """
@@ -199,8 +248,9 @@ class Heuristics (Module):
             available suffixes depend on available languages
             throws SourceNotFoundError if nothing found
         """
+        self.__probe (path)
         for filename in [path + '.' + suffix for suffix in self.__compiler_suffixes.keys ()] + [path]:
-            if not os.path.isfile (filename):
+            if not self.__isfile (filename):
                 continue
             return filename
         raise self._error (path, cls=SourceNotFoundError)
@@ -214,7 +264,7 @@ class Heuristics (Module):
         except KeyError:
             detector = lambda path: self.__compiler_suffixes [suffix]
         try:
-            compiler = detector (path)
+            compiler = self._compilers[detector (path)]
         except KeyError:
             raise self._error ("unknown source: '%s'" % path)
         if run_in_directory:
@@ -250,6 +300,7 @@ class Heuristics (Module):
                 data = f.read ()
         except FileNotFoundError:
             raise self._error ("problem.xml", cls=NotFoundError) from None
+        import xml.etree.ElementTree as xml  # rare case, don't load it on every start
         data = xml.XML (data)
         if list (sorted (data.attrib.keys ())) == ['id', 'version'] and data.attrib['version'] == "1.0":
             self._log.info ("ignore problem.xml: not problem data but config for PCMS2")
@@ -264,28 +315,45 @@ class Heuristics (Module):
         except FileNotFoundError:
             raise self._error ("problem.properties", cls=NotFoundError) from None
 
+    GASSA = [
+        'IO_FILES', 'USE_GRADERS', 'PROBLEM', 'AUTHOR', 'SUFFIX', 'LANGUAGE', 'SOLUTION',
+        'GENERATOR', 'VALIDATOR', 'CHECKER', 'TEST_PATTERN', 'DO_CHECK', 'DO_CLEAN',
+        'CUSTOM_WIPE'
+    ]
+
+    def __gassa_options ( self, directory ):
+        """ variables from problem.sh, all of them are printed by single bash, None if it fails """
+        bash = Executable (['bash'], source=None, path=None, t=self)
+        result = bash.run ([
+            '-c',
+            '. problem.sh && for name in %s; do printf \'%%s=%%s\\0\' "$name" "${!name}"; done'
+            % ' '.join (Heuristics.GASSA)
+        ], directory=directory, stdout=subprocess.PIPE)
+        if not result:
+            return None
+        options = {}
+        for item in result.stdout.split ('\0'):
+            if '=' not in item:
+                continue
+            key, value = item.split ('=', 1)
+            value = value.strip ()
+            if value:
+                options[key] = value
+        return options
+
     def __problem_open_gassa ( self, path ):
         """problem with tools.sh, problem.sh and many scripts made by Gassa commonly in SPbSU archives"""
         directory_source = self.__directory_search_source (path)
         problem_sh = os.path.join (directory_source, 'problem.sh')
-        if not os.path.isfile (problem_sh):
+        if not os.path.isfile (os.path.join (path, problem_sh)):
             raise self._error ("problem.sh", cls=NotFoundError) from None
-        bash = Executable (['bash'], source=None, path=None, t=self)
-        def option ( name ):
-            nonlocal bash, directory_source
-            result = bash.run (['-c', ". problem.sh && echo \"${%s}\"" % name], directory=directory_source, stdout=subprocess.PIPE)
-            data = result.stdout.strip ()
-            if not data:
-                return None
-            return data
-        options_gassa = {
-            key: value for key, value in map (lambda key: (key, option (key)),
-            [
-                'IO_FILES', 'USE_GRADERS', 'PROBLEM', 'AUTHOR', 'SUFFIX', 'LANGUAGE', 'SOLUTION',
-                'GENERATOR', 'VALIDATOR', 'CHECKER', 'TEST_PATTERN', 'DO_CHECK', 'DO_CLEAN',
-                'CUSTOM_WIPE'
-            ]) if value is not None
-        }
+        options_gassa = self._t.metadata.get (path, 'gassa', [problem_sh])
+        if options_gassa is None:
+            options_gassa = self.__gassa_options (os.path.join (path, directory_source))
+            if options_gassa is None:
+                options_gassa = {}  # broken problem.sh, nothing to remember
+            else:
+                self._t.metadata.put (path, 'gassa', [problem_sh], options_gassa)
         options = {
             key: os.path.normpath (os.path.join (directory_source, options_gassa[keyg])) for key, keyg in [
                 ('solution', 'SOLUTION'),
@@ -303,26 +371,159 @@ class Heuristics (Module):
         # TODO: use test mask
         return options
 
+    MAKEFILE_ASSIGNMENT = re.compile (
+        r'^(?:override\s+|export\s+)?([A-Za-z_][A-Za-z0-9_.-]*)\s*(::=|:=|\?=|\+=|=)\s*(.*)$'
+    )
+    MAKEFILE_INCLUDE = re.compile (r'^-?s?include\s+(.*)$')
+    MAKEFILE_REFERENCE = re.compile (r'\$(?:\(([^()$:]*)\)|\{([^{}$:]*)\}|(\$))')
+
+    def __makefile_expand ( self, value, variables, depth=0 ):
+        """ expand variable references like make does, None if there is something more complex """
+        if depth > 16:
+            return None
+        unknown = False
+        def replace ( match ):
+            nonlocal unknown
+            if match.group (3) is not None:
+                return '$'
+            name = match.group (1) if match.group (1) is not None else match.group (2)
+            if not re.match (r'^[A-Za-z_][A-Za-z0-9_.-]*$', name):
+                unknown = True  # make function, we don't know how to call it
+                return ''
+            if name not in variables:
+                return os.environ.get (name, '')
+            recursive, raw = variables[name]
+            result = self.__makefile_expand (raw, variables, depth + 1) if recursive else raw
+            if result is None:
+                unknown = True
+                return ''
+            return result
+        result = Heuristics.MAKEFILE_REFERENCE.sub (replace, value)
+        if unknown or '$' in result.replace ('$$', ''):
+            return None
+        return result
+
+    def __makefile_parse ( self, path, name, variables, files, rules ):
+        """
+            read assignments, includes and rule names from makefile without make,
+            returns False if some included file can't be found
+        """
+        try:
+            with open (os.path.join (path, name), 'r') as f:
+                data = f.read ()
+        except FileNotFoundError:
+            return False
+        files.append (name)
+        complete = True
+        for line in data.replace ('\\\n', ' ').split ('\n'):
+            if line.startswith ('\t'):
+                continue  # recipe
+            line = line.split ('#', 1)[0].strip ()
+            match = Heuristics.MAKEFILE_INCLUDE.match (line)
+            if match is not None:
+                included = self.__makefile_expand (match.group (1), variables)
+                if included is None:
+                    complete = False
+                    continue
+                for x in included.split ():
+                    included_path = os.path.normpath (x)
+                    complete = self.__makefile_parse (
+                        path, included_path, variables, files, rules
+                    ) and complete
+                continue
+            match = Heuristics.MAKEFILE_ASSIGNMENT.match (line)
+            if match is None:
+                if ':' in line and '=' not in line.split (':', 1)[0]:
+                    rules.update (line.split (':', 1)[0].split ())
+                continue
+            key, operator, value = match.groups ()
+            if operator == '?=' and key in variables:
+                continue
+            if operator == '+=' and key in variables:
+                recursive, raw = variables[key]
+                if recursive:
+                    variables[key] = (True, raw + ' ' + value)
+                else:
+                    expanded = self.__makefile_expand (value, variables)
+                    if expanded is not None:
+                        variables[key] = (False, raw + ' ' + expanded)
+                    else:
+                        variables[key] = (True, raw + ' ' + value)
+                continue
+            if operator in (':=', '::='):
+                expanded = self.__makefile_expand (value, variables)
+                variables[key] = (False, expanded) if expanded is not None else (True, value)
+            else:
+                variables[key] = (True, value)
+        return complete
+
+    def __makefile_options ( self, path ):
+        """
+            what we need from pkun makefile, None if it isn't one;
+            make is called only if we can't parse makefile
+        """
+        variables = {}
+        files = []
+        rules = set ()
+        complete = self.__makefile_parse (path, 'makefile', variables, files, rules)
+        if not files:
+            return None, files
+        # the same as old `grep -- := makefile`: only simple assignments of makefile itself
+        legacy = {}
+        with open (os.path.join (path, 'makefile'), 'r') as f:
+            for line in f:
+                if ':=' not in line:
+                    continue
+                key, value = line.split (':=', 1)
+                key, value = key.strip (), value.split ('#', 1)[0].strip ()
+                expanded = self.__makefile_expand (value, variables)
+                legacy[key] = expanded.strip () if expanded is not None else value
+        if not legacy:
+            return None, files
+        info = {}
+        for key in ['problem', 'mainSuffix']:
+            value = self.__makefile_expand ('$(%s)' % key, variables)
+            if value is None:
+                complete = False
+            elif value.strip ():
+                info['$(%s)' % key] = value.strip ()
+        if complete and 'problemInfo' not in rules:
+            return None, files  # make problemInfo would fail
+        if not complete:
+            make = Executable (['make'], source=None, path=None, t=self)
+            result = make.run (
+                ['problemInfo'], directory=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            if not result:
+                return None, files
+            info = {}
+            for line in result.stdout.split ('\n'):
+                if ':' not in line or '=' not in line:
+                    continue
+                nonse, value = line.split (':', 1)
+                key, value = value.split ('=', 1)
+                info[key.strip ()] = value.strip ()
+        return {'legacy': legacy, 'info': info}, files
+
     def __problem_open_makefile ( self, path ):
         """problem with makefiles, likely from pkun"""
         options = {
             'generator': Executable (['make'], source=None, path=None, t=self),
             'cleaner': Executable (['make', 'clean'], source=None, path=None, t=self)
         }
-        options_pkun_legacy = {}
-        grep = Executable (['grep'], source=None, path=None, t=self)
-        result = grep.run (['--', ':=', 'makefile'], directory=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-        # self._log.debug ("__problem_open_makefile ", result)
-        if not result:
+        cached = self._t.metadata.get (path, 'makefile')  # makefile and everything it includes
+        if cached is None:
+            value, files = self.__makefile_options (path)
+            if not files:
+                raise self._error ("makefile", cls=NotFoundError)
+            cached = self._t.metadata.put (path, 'makefile', files, {'value': value})
+        if cached['value'] is None:
             raise self._error ("makefile", cls=NotFoundError)
-        for line in result.stdout.split ('\n'):
-            if ':=' not in line:
-                continue
-            key, value = line.split (':=', 1)
-            options_pkun_legacy[key.strip ()] = value.strip ()
+        options_pkun_legacy = cached['value']['legacy']
+        options_pkun = cached['value']['info']
         try:
-            directory_source = self.__directory_search_source ()
-            self.__interactor_search ({'directory-source': directory_source})
+            directory_source = self.__directory_search_source (path)
+            self.__interactor_search ({'directory-source': os.path.join (path, directory_source)})
             interactive = True
         except NotFoundError:
             interactive = False
@@ -330,18 +531,6 @@ class Heuristics (Module):
             options['input-file'] = options_pkun_legacy['InputFileName']
         if 'OutputFileName' in options_pkun_legacy:
             options['output-file'] = options_pkun_legacy['OutputFileName']
-
-        make = Executable (['make'], source=None, path=None, t=self)
-        result = make.run (['problemInfo'], directory=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-        if not result:
-            raise self._error ("makefile", cls=NotFoundError)
-        options_pkun = {}
-        for line in result.stdout.split ('\n'):
-            if ':' not in line or '=' not in line:
-                continue
-            nonse, info = line.split (':', 1)
-            key, value = info.split ('=', 1)
-            options_pkun[key.strip ()] = value.strip ()
         if '$(problem)' in options_pkun:
             options['id'] = options_pkun['$(problem)']
         if '$(mainSuffix)' in options_pkun: # I'd like to use $(mainSrc), but it has useless comment after value
@@ -447,16 +636,15 @@ class Heuristics (Module):
             @param path directory to start from
             yields all subdirectories which look like problems
         """
-        queue = [path]
-        for path in queue:
-            if not os.path.isdir (path):
-                continue
+        found = {}
+        def accept ( path ):
             options = self.problem_preopen (path)
-            # self._log.debug (path, options=)
-            if options is not None:
-                yield self.problem_open (path, options_raw=options)
-            else:
-                queue += [os.path.join (path, x) for x in sorted (os.listdir (path))]
+            if options is None:
+                return False
+            found[path] = options
+            return True
+        for path in self._t.discovery.search (path, accept):
+            yield self.problem_open (path, options_raw=found.pop (path))
 
 
     def problem_preopen ( self, path ):
@@ -473,38 +661,81 @@ class Heuristics (Module):
                 pass
         raise self._error ("problem in '%s'" % path, cls=NotFoundError)
 
+    @contextlib.contextmanager
+    def __inside ( self, path ):
+        """ work in problem directory, where listings of directories are collected (__listing) """
+        path_old = os.getcwd ()
+        listings = self.__listings
+        os.chdir (path)
+        self.__listings = {}
+        try:
+            yield
+        finally:
+            self.__listings = listings
+            os.chdir (path_old)
+
+    def __search ( self, path, key, search, fingerprint ):
+        """
+            value of option key found by search (None if nothing found); results of searches depend
+            only on which files exist, so they are cached while probed directories are the same
+        """
+        record = self._t.metadata.get (path, 'resolved:' + key)
+        if record is not None and record['fingerprint'] == fingerprint:
+            return record['value']
+        probed, self.__probed = self.__probed, set ()
+        try:
+            try:
+                value = search ()
+            except (KeyError, NotFoundError):
+                value = None
+            mine = self.__probed
+        finally:
+            self.__probed = probed
+        if value is None or type (value) is str:
+            self._t.metadata.put (
+                path, 'resolved:' + key, sorted (mine), {'fingerprint': fingerprint, 'value': value}
+            )
+        return value
+
     def problem_open ( self, path='.', *, options_raw=None ):
+        """
+            open problem in path, its components (generator, validator, checker etc.)
+            are found and opened only when somebody needs them
+        """
         if options_raw is None:
             options_raw = self.problem_preopen (path)
         if options_raw is None:
             if path == '.':
                 path = os.path.split (os.path.abspath ('.'))[-1]
             raise self._error ("not a problem: '%s'" % path)
-        path_old = os.getcwd ()
         path_canonical = os.path.abspath (path)
-        try:
-            os.chdir (path)
-    
+        with self.__inside (path_canonical):
             options = {}
-            options_ok = {'solution-token'}
+            options_ok = {'solution-token', 'validator-batch'}
             options_defaults = {}
+
+            fingerprint = repr ((
+                sorted ((key, str (value)) for key, value in options_raw.items ()),
+                sorted (self.__compiler_suffixes.keys ()),
+                self.__arguments.checker
+            ))
+            search = lambda key, function: (
+                lambda: self.__search (path_canonical, key, function, fingerprint)
+            )
     
             for key, target, default in [
-                ('id', options_raw, lambda: os.path.basename (os.path.abspath (path))),
+                ('id', options_raw, lambda: os.path.basename (path_canonical)),
                 ('id', options, lambda: options_raw['id']),
-                ('directory-source', options_raw, lambda: self.__directory_search_source ()),
-                ('directory-solutions', options_raw, lambda: self.__directory_search_solutions ()),
+                ('directory-source', options_raw,
+                    search ('directory-source', self.__directory_search_source)),
+                ('directory-solutions', options_raw,
+                    search ('directory-solutions', self.__directory_search_solutions)),
                 ('directory-temp', options_raw, lambda: '.temp'),
                 ('directory-tests', options_raw, lambda: 'tests'),
     #         # if 'tests-directory' not in configuration:
     #         #    configuration.update({'tests-directory': os.path.join(path, 'tests')})
                 ('checker', options_raw, lambda: self.__arguments.checker),
                 # TODO check from arguments is forced
-                ('generator', options_raw, lambda: self.__generator_search (options_raw)),
-                ('validator', options_raw, lambda: self.__validator_search (options_raw)),
-                ('interactor', options_raw, lambda: self.__interactor_search (options_raw)),
-                ('checker', options_raw, lambda: self.__checker_search (options_raw)),
-                ('cleaner', options_raw, lambda: self.__cleaner_search (options_raw)),
                 ('time-limit', options_raw, lambda: self._log.notice ('time limit not set')),
                 ('idle-limit', options_raw, lambda: self._log.notice ('idle limit not set')),
                 ('memory-limit', options_raw, lambda: self._log.notice ('memory limit not set')),
@@ -512,15 +743,18 @@ class Heuristics (Module):
                 # ('output-file', options_raw, lambda: self._log.notice ('output not set')),
                 ('input-file', options_raw, lambda: options_raw['id'] + '.in'),
                 ('output-file', options_raw, lambda: options_raw['id'] + '.out'),
-                ('solution', options_raw, lambda: self.__solution_search (options_raw)),
                 ('limit_time', options_defaults, lambda: self.__parse_time (options_raw['time-limit'])),
                 ('limit_idle', options_defaults, lambda: self.__parse_time (options_raw['idle-limit'])),
                 ('limit_memory', options_defaults, lambda: self.__parse_memory (options_raw['memory-limit'])),
-                ('filename_input', options_defaults, lambda: options_raw['input-file']),
-                ('filename_output', options_defaults, lambda: options_raw['output-file']),
+                ('filename_input', options_defaults,
+                    lambda: self.__parse_file (options_raw['input-file'], Settings.STDIN)),
+                ('filename_output', options_defaults,
+                    lambda: self.__parse_file (options_raw['output-file'], Settings.STDOUT)),
                 ('directory_source', options, lambda: options_raw['directory-source']),
+                ('directory_solutions', options, lambda: options_raw['directory-solutions']),
                 ('directory_temp', options, lambda: options_raw['directory-temp']),
                 ('directory_tests', options, lambda: options_raw['directory-tests']),
+                ('validator_batch', options, lambda: options_raw['validator-batch'] == 'true'),
             ]:
                 options_ok.add (key)
                 if key in target:
@@ -535,37 +769,55 @@ class Heuristics (Module):
                     target[key] = value
     
             defaults = Settings (self._t.defaults, **options_defaults)
+            found = []
+            def files ():
+                """ sources and garbage, needed only for clean, so they are searched on demand """
+                if not found:
+                    found.append (self.__files_search ('.', options_raw.get ('directory-tests')))
+                return found[0]
             problem = Problem (
                 path_canonical,
                 **options,
                 defaults=defaults,
-                sources=[self.__source_open (x) for x in self.__source_search_all ('.')],
-                garbage=[x for x in self.__garbage_search ('.')],
+                sources=lambda: [self.__source_open (x) for x in files ()[0]],
+                garbage=lambda: files ()[1],
                 t=self._t
             )
-            if 'generator' in options_raw:
-                options_ok.add ('generator')
-                problem.generator = self.__generator_open (options_raw['generator'], directory_tests=options_raw['directory-tests'], problem=problem)
-            if 'validator' in options_raw:
-                options_ok.add ('validator')
-                problem.validator = self.__validator_open (options_raw['validator'], problem=problem)
-            if 'interactor' in options_raw:
-                options_ok.add ('interactor')
-                problem.interactor = self.__source_open (options_raw['interactor'])
-            if 'checker' in options_raw:
-                options_ok.add ('checker')
-                problem.checker = self.__checker_open (options_raw['checker'])
-            if 'cleaner' in options_raw:
-                options_ok.add ('cleaner')
-                problem.cleaner = self.__source_open (options_raw['cleaner'], run_in_directory=True)
-            if 'solution' in options_raw:
-                options_ok.add ('solution')
-                problem.solution_model = self.solution_open (options_raw['solution'], problem=problem)
-            try:
-                if problem.generator is not None:
-                    problem.tests = problem.generator.tests ()
-            except TestsNotFoundError:
-                pass
+            for key, name, function, opener in [
+                ('generator', 'generator', lambda: self.__generator_search (options_raw),
+                    lambda value: self.__generator_open (
+                        value, directory_tests=options_raw['directory-tests'], problem=problem
+                    )),
+                ('validator', 'validator', lambda: self.__validator_search (options_raw),
+                    lambda value: self.__validator_open (value, problem=problem)),
+                ('interactor', 'interactor', lambda: self.__interactor_search (options_raw),
+                    lambda value: self.__source_open (value)),
+                ('checker', 'checker', lambda: self.__checker_search (options_raw),
+                    lambda value: self.__checker_open (value)),
+                ('cleaner', 'cleaner', lambda: self.__cleaner_search (options_raw),
+                    lambda value: self.__source_open (value, run_in_directory=True)),
+                ('solution', 'solution_model', lambda: self.__solution_search (options_raw),
+                    lambda value: self.solution_open (value, problem=problem)),
+            ]:
+                options_ok.add (key)
+                def resolve ( key=key, function=function, opener=opener ):
+                    with self.__inside (path_canonical):
+                        if key in options_raw:
+                            value = options_raw[key]
+                        else:
+                            value = search (key, function) ()
+                        return None if value is None else opener (value)
+                problem.lazy (name, resolve)
+            def tests ():
+                generator = problem.generator
+                if generator is None:
+                    return None
+                with self.__inside (path_canonical):
+                    try:
+                        return generator.tests ()
+                    except TestsNotFoundError:
+                        return None
+            problem.lazy ('tests', tests)
             
             for key in options_raw.keys ():
                 if key in options_ok:
@@ -573,8 +825,6 @@ class Heuristics (Module):
                 self._log.warning ("ignored option: %s" % key)
         
             return problem
-        finally:
-            os.chdir (path_old)
 
     def defaults ( self, *args, **kwargs ):
         return Settings (
@@ -582,8 +832,10 @@ class Heuristics (Module):
             limit_time = None if self.__arguments.limit_time is None else self.__parse_time (self.__arguments.limit_time),
             limit_idle = None if self.__arguments.limit_idle is None else self.__parse_time (self.__arguments.limit_idle),
             limit_memory = None if self.__arguments.limit_memory is None else self.__parse_memory (self.__arguments.limit_memory),
-            filename_input = None if self.__arguments.filename_input is None else self.__arguments.filename_input,
-            filename_output = None if self.__arguments.filename_output is None else self.__arguments.filename_output,
+            filename_input = None if self.__arguments.filename_input is None
+                else self.__parse_file (self.__arguments.filename_input, Settings.STDIN),
+            filename_output = None if self.__arguments.filename_output is None
+                else self.__parse_file (self.__arguments.filename_output, Settings.STDOUT),
             **kwargs
         )
 
@@ -591,6 +843,23 @@ class Heuristics (Module):
         solution = self.__source_search (path)
         return self.__source_open (solution, *args, cls=Solution, **kwargs)
 
+    def solutions_search ( self, problem, **kwargs ):
+        """
+            open all solutions of problem: everything in its directory with solutions,
+            or <id>_* if solutions lie right in problem directory; paths are relative to problem
+        """
+        directory = problem.directory_solutions
+        if directory is None:
+            return []
+        with self.__inside (problem.path):
+            return [
+                self.solution_open (os.path.join (directory, name), problem=problem, **kwargs)
+                for name, is_directory in sorted (self.__listing (directory).items ())
+                if not is_directory and '.' in name
+                and name.split ('.')[-1] in self.__compiler_suffixes
+                and (directory != '.' or name.startswith (str (problem) + '_'))
+            ]
+
     def tests_search ( self, directory, problem ):
         tests = []
         try:
@@ -613,7 +882,9 @@ class Heuristics (Module):
 
 class TestlibChecker (Checker):
     def __init__ ( self, *args, testlib_name, **kwargs ):
-        super (TestlibChecker, self).__init__ (*args, **kwargs)
+        import comparators  # small, but needed only for testlib checkers
+        builtin = comparators.COMPARATORS.get (testlib_name)
+        super (TestlibChecker, self).__init__ (*args, builtin=builtin, **kwargs)
         self.__name = testlib_name
 
     def __str__ ( self ):
@@ -754,27 +1025,46 @@ class TestlibChecker (Checker):
 # Здесь начинается конфигурация компиляторов. Мерзкая штука, не правда ли?
 
 class Configuration (Module):
-    def __init__ ( self, testlib_checker_path=None, *args, **kwargs ):
+    def __init__ ( self, testlib_checker_path=None, *args, compilation_cache=None, **kwargs ):
         super (Configuration, self).__init__ (*args, **kwargs)
         self.__testlib_checker_path = testlib_checker_path
-        self.__compilers = {}
+        self.__compilation_cache = compilation_cache
+        self.__compilers = compilers.Compilers ()
         self.__configure_compilers ()
     
     testlib_checker_path = property (lambda self: self.__testlib_checker_path)
+    compilation_cache = property (lambda self: self.__compilation_cache)
     compilers = property (lambda self: self.__compilers)
 
-    def __compiler_register ( self, compiler ):
-        self.__compilers[compiler.name] = compiler
+    def __compiler_register ( self, name, suffixes=[], **kwargs ):
+        self.__compilers.register (
+            name, suffixes, lambda: compilers.Compiler (name, suffixes=suffixes, **kwargs, t=self)
+        )
 
     def __configure_compilers ( self ):
         # include_path = '/home/burunduk3/user/include/testlib.ifmo'
         include_path = '/home/burunduk3/user/include'
-        compile_c = Executable (['gcc', '-Wall', '-Wextra', '-D__T_SH__', '-lm', '-I', include_path] + os.environ.get ('CFLAGS', '').split () + ['-Wno-error'], source=None, path=None, t=self)
-        compile_cpp = Executable (['g++', '-Wall', '-Wextra', '-D__T_SH__', '-lm', '-I', include_path] + os.environ.get ('CXXFLAGS', '').split () + ['-Wno-error'], source=None, path=None, t=self)
-        compile_delphi = Executable (['fpc', '-Mdelphi', '-O3', '-FE.', '-v0ewn', '-Sd', '-Fu' + include_path, '-Fi' + include_path, '-d__T_SH__'], source=None, path=None, t=self)
-        compile_dmd = Executable (['dmd', '-O', '-wi', '-od.'], source=None, path=None, t=self)
-        compile_fpc = Executable (['fpc', '-O3', '-FE.', '-v0ewn', '-Sd', '-Fu' + include_path, '-Fi' + include_path, '-d__T_SH__'], source=None, path=None, t=self)
-        compile_java = Executable (['javac'], source=None, path=None, t=self)
+        compiler_executable = lambda arguments: Executable (
+            arguments, source=None, path=None, t=self
+        )
+        compile_c = lambda: compiler_executable (
+            ['gcc', '-Wall', '-Wextra', '-D__T_SH__', '-lm', '-I', include_path]
+            + os.environ.get ('CFLAGS', '').split () + ['-Wno-error']
+        )
+        compile_cpp = lambda: compiler_executable (
+            ['g++', '-Wall', '-Wextra', '-D__T_SH__', '-lm', '-I', include_path]
+            + os.environ.get ('CXXFLAGS', '').split () + ['-Wno-error']
+        )
+        compile_delphi = lambda: compiler_executable ([
+            'fpc', '-Mdelphi', '-O3', '-FE.', '-v0ewn', '-Sd',
+            '-Fu' + include_path, '-Fi' + include_path, '-d__T_SH__'
+        ])
+        compile_dmd = lambda: compiler_executable (['dmd', '-O', '-wi', '-od.'])
+        compile_fpc = lambda: compiler_executable ([
+            'fpc', '-O3', '-FE.', '-v0ewn', '-Sd',
+            '-Fu' + include_path, '-Fi' + include_path, '-d__T_SH__'
+        ])
+        compile_java = lambda: compiler_executable (['javac'])
         java_cp_suffix = os.environ.get ('CLASSPATH', None)
         if java_cp_suffix is None:
             java_cp_suffix = ""
@@ -782,6 +1072,15 @@ class Configuration (Module):
             java_cp_suffix = ":" + java_cp_suffix
 
         suffix_remove = lambda source: os.path.splitext (source.path)[0]
+        def artifacts_java ( source, binary, directory ):
+            # nested classes are compiled into separate files
+            location = binary if directory is None else os.path.join (directory, binary)
+            stem = os.path.splitext (os.path.basename (binary))[0]
+            return [binary] + sorted (
+                os.path.join (os.path.dirname (binary), x)
+                for x in os.listdir (os.path.dirname (location) or '.')
+                if x.startswith (stem + '$') and x.endswith ('.class')
+            )
         def executable_binary ( path, source ):
             nonlocal self
             if path[0] != '/':
@@ -793,64 +1092,71 @@ class Configuration (Module):
         def executable_java_checker ( path, source ):
             nonlocal self, java_cp_suffix
             return Executable (['java', '-Xms8M', '-Xmx128M', '-Xss64M', '-ea', '-cp', os.path.dirname (path) + java_cp_suffix, 'ru.ifmo.testlib.CheckerFramework', os.path.splitext (os.path.basename (path))[0]], source, path=path, t=self)
-        script = lambda n, s: compilers.Compiler (n, suffixes=s, executable=lambda path, source: Executable ([n, path], source, path=path, t=self), t=self)
+        script = lambda n, s: dict (
+            name=n, suffixes=s,
+            executable=lambda path, source: Executable ([n, path], source, path=path, t=self)
+        )
         
+        # compilers are made on first use, here we only describe them
         for compiler in [
             script ('bash', ['sh']),
             script ('perl', ['pl']),
             script ('python2', []),
             script ('python3', []),
-            compilers.Compiler (
+            dict (
                 name='c.gcc', suffixes=['c'],
                 binary=suffix_remove,
-                compile=lambda source, binary: (compile_c, ['-o', binary, '-x', 'c', source.path]),
+                compile=lambda source, binary: (
+                    compile_c (), ['-o', binary, '-x', 'c', source.path]
+                ),
                 executable=executable_binary,
-                t=self
             ),
        #'c++': 'c++', 'C': 'c++', 'cxx': 'c++', 'cpp': 'c++',
-            compilers.Compiler (
+            dict (
                 name='c++.gcc', suffixes=['c++', 'C', 'cc', 'cxx', 'cpp'],
                 binary=suffix_remove,
-                compile=lambda source, binary: (compile_cpp, ['-o', binary, '-x', 'c++', '-std=c++17', source.path]),
+                compile=lambda source, binary: (
+                    compile_cpp (), ['-o', binary, '-x', 'c++', '-std=c++17', source.path]
+                ),
                 executable=executable_binary,
-                t=self
             ),
-            compilers.Compiler (
+            dict (
                 name='delphi.fpc', suffixes=['dpr'],
                 binary=suffix_remove,
-                compile=lambda source, binary: (compile_delphi, ['-o' + binary, source.path]),
+                compile=lambda source, binary: (compile_delphi (), ['-o' + binary, source.path]),
                 executable=executable_binary,
-                t=self
             ),
-            compilers.Compiler (
+            dict (
                 name='pascal.fpc', suffixes=['pas'],
                 binary=suffix_remove,
-                compile=lambda source, binary: (compile_fpc, ['-o' + binary, source.path]),
+                compile=lambda source, binary: (compile_fpc (), ['-o' + binary, source.path]),
                 executable=executable_binary,
-                t=self
             ),
-            compilers.Compiler (
+            dict (
                 name='dmd', suffixes=['d'],
                 binary=suffix_remove,
-                compile=lambda source, binary: (compile_dmd, ['-of' + binary, source.path]),
+                compile=lambda source, binary: (compile_dmd (), ['-of' + binary, source.path]),
                 executable=executable_binary,
-                t=self
             ),
-            compilers.Compiler (
+            dict (
                 name='java', suffixes=['java'],
                 binary = lambda source: os.path.splitext (source.path)[0] + '.class',
-                compile=lambda source, target: (compile_java, ['-cp', os.path.dirname (source.path), source.path]),
+                compile=lambda source, target: (
+                    compile_java (), ['-cp', os.path.dirname (source.path), source.path]
+                ),
                 executable=executable_java,
-                t=self
+                artifacts=artifacts_java,
             ),
-            compilers.Compiler (
+            dict (
                 name='java.checker', suffixes=[],
                 binary = lambda source: os.path.splitext (source.path)[0] + '.class',
-                compile=lambda source, target: (compile_java, ['-cp', os.path.dirname (source.path), source.path]),
+                compile=lambda source, target: (
+                    compile_java (), ['-cp', os.path.dirname (source.path), source.path]
+                ),
                 executable=executable_java_checker,
-                t=self
+                artifacts=artifacts_java,
             ),
         ]:
-            self.__compiler_register (compiler)
+            self.__compiler_register (**compiler)
 
 
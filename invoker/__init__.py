@@ -18,18 +18,27 @@
 #
 
 
+from tlib import Error
 from .common import *
 
 def runner_choose ( t ):
+    """ runner for this host: cgroup one if cgroup is delegated, advanced or basic otherwise """
+    try:
+        from . import cgroup
+        if cgroup.available ():
+            return cgroup.Runner (t=t)
+    except (ImportError, OSError, Error) as e:  # cgroup may be delegated only partially
+        t.log.warning ('cgroup runner failed:', e)
+
     try:
         from .advanced import Runner
-        return Runner
+        return Runner (t=t)
     except ImportError as e:
         t.log.warning ('advanced runner failed:', e)
 
     try:
         from .basic import Runner
-        return Runner
+        return Runner (t=t)
     except ImportError as e:
         t.log.warning ('basic runner failed:', e)
 
@@ -20,6 +20,8 @@
 import os
 import time
 import resource
+import selectors
+import signal
 import subprocess
 
 from tlib import Log, Module
@@ -27,16 +29,21 @@ from .common import *
 
 
 class Process:
-    class CONTINUE:
-        pass
+    SAMPLE = 0.1  # interval for resource usage sampling, seconds
+    SAMPLE_PROFILE = 0.01  # same when every sample is recorded
 
     def __init__ ( self,
         command, *,
         directory=None,
         stdin=None, stdout=None, stderr=None,
-        limit_time=None, limit_idle=None, limit_memory=None
+        limit_time=None, limit_idle=None, limit_memory=None,
+        cpu=None, group=None, profile=False
     ):
+        """ profile: record every sample, see usage.Series """
         self.__start = time.time ()
+        self.__group = group
+        if group is not None:
+            command = group.command (command)
         if type (stdin) is str:
             stdin = open (stdin, "rb")
         if type (stdout) is str:
@@ -47,6 +54,24 @@ class Process:
             command, cwd=directory, stdin=stdin, stdout=stdout, stderr=stderr
         )
         self.__pid = self.__popen.pid
+        if cpu is not None:
+            try:
+                os.sched_setaffinity (self.__pid, {cpu})
+            except ProcessLookupError:
+                pass
+        # process is not reaped until wait4, so pidfd always refers to our child
+        try:
+            self.__pidfd = os.pidfd_open (self.__pid)
+        except (AttributeError, OSError):
+            self.__pidfd = None
+        self.__pipes = {}
+        self.__outputs = []
+        for stream in (self.__popen.stdout, self.__popen.stderr):
+            if stream is None:
+                self.__outputs.append (None)
+                continue
+            self.__outputs.append ([])
+            self.__pipes[stream.fileno ()] = (stream, self.__outputs[-1])
         self.__limit_time = limit_time
         self.__limit_idle = limit_idle
         self.__limit_memory = limit_memory
@@ -54,52 +79,163 @@ class Process:
         self.__usage_idle = 0.0
         self.__usage_memory = 0
         self.__peak_memory = 0
+        self.__profile = [] if profile else None
+        self.__result = None
 
     usage_time = property (lambda self: self.__usage_time)
     usage_memory = property (lambda self: self.__usage_memory)
     peak_memory = property (lambda self: self.__peak_memory)
+    pidfd = property (lambda self: self.__pidfd)
+    pipes = property (lambda self: list (self.__pipes.keys ()))
 
     def peaks ( self ):
         return {
             'peak_time': self.__usage_time,
-            'peak_memory': self.__peak_memory
+            'peak_memory': self.__peak_memory,
+            'profile': self.__profile
         }
 
-    def check ( self ):
-        code = self.__popen.returncode
-        if code is not None:
-            return code
-        try:  # так может случиться, что процесс завершится в самый интересный момент
-            with open("/proc/%d/stat" % self.__pid, 'r') as f:
-                stats = f.readline ().split ()
-            with open("/proc/%d/statm" % self.__pid, 'r') as f:
-                stats_m = f.readline ().split ()
+    def outputs ( self ):
+        return tuple (None if x is None else b''.join (x) for x in self.__outputs)
+
+    def read ( self, fd ):
+        """ read available data from pipe, returns False on end of file """
+        stream, output = self.__pipes[fd]
+        data = os.read (fd, 1 << 16)
+        if data:
+            output.append (data)
+            return True
+        stream.close ()
+        del self.__pipes[fd]
+        return False
+
+    def __limits ( self ):
+        if self.__group is not None and self.__group.oom ():
+            return RunResult.limitMemory ('memory usage: out of memory', **self.peaks ())
+        if self.__limit_time is not None and self.__usage_time > self.__limit_time:
+            return RunResult.limitTime ('cpu usage: %.2f' % self.__usage_time, **self.peaks ())
+        if self.__limit_idle is not None and self.__usage_idle > self.__limit_idle:
+            return RunResult.limitIdle ('time usage: %.2f' % self.__usage_idle, **self.peaks ())
+        if self.__limit_memory is not None and self.__peak_memory > self.__limit_memory:
+            return RunResult.limitMemory ('memory usage: %d' % self.__peak_memory, **self.peaks ())
+        return None
+
+    def __reap ( self, options ):
+        pid, status, usage = os.wait4 (self.__pid, options)
+        if pid == 0:
+            return None
+        code = os.waitstatus_to_exitcode (status)
+        self.__popen.returncode = code
+        self.__usage_idle = time.time () - self.__start
+        if self.__group is not None:
+            self.__usage_time, self.__usage_memory, self.__peak_memory = self.__group.usage ()
+        else:
+            self.__usage_time = usage.ru_utime + usage.ru_stime
+            # child's maxrss includes memory of forked t.py before exec,
+            # so it's reliable only when it's bigger
+            if usage.ru_maxrss > resource.getrusage (resource.RUSAGE_SELF).ru_maxrss:
+                self.__peak_memory = max (self.__peak_memory, usage.ru_maxrss * 1024)
+        if self.__profile is not None:  # process is gone, only times are known
+            sample = (round (self.__usage_idle, 6), self.__usage_time, None, None, None, None)
+            self.__profile.append (sample)
+        limits = self.__limits ()
+        self.__result = limits if limits is not None else code
+        return self.__result
 
-            self.__usage_time = (int (stats[13]) + int (stats[14])) / \
-                os.sysconf (os.sysconf_names['SC_CLK_TCK'])
+    def poll ( self ):
+        """ exit code or limit RunResult if process has finished, None otherwise """
+        if self.__result is not None:
+            return self.__result
+        return self.__reap (os.WNOHANG)
+
+    def wait ( self ):
+        if self.__result is not None:
+            return self.__result
+        return self.__reap (0)
+
+    def sample ( self ):
+        """ update current usage from /proc, kill process and return RunResult if limit exceeded """
+        if self.__result is not None:
+            return None
+        if self.__group is not None:
             self.__usage_idle = time.time () - self.__start
-            self.__usage_memory = int (stats_m[0]) * 1024
-            self.__peak_memory = max (self.__peak_memory, self.__usage_memory)
-
-            if self.__limit_time is not None and self.__usage_time > self.__limit_time:
-                return RunResult.limitTime ('cpu usage: %.2f' % self.__usage_time, **self.peaks ())
-                self.__popen.kill ()
-            if self.__limit_idle is not None and self.__usage_idle > self.__limit_idle:
-                return RunResult.limitIdle ('time usage: %.2f' % self.__usage_idle, **self.peaks ())
-                self.__popen.kill ()
-            if self.__limit_memory is not None and self.__usage_memory > self.__limit_memory:
-                return RunResult.limitMemory ('memory usage: %d' % self.__usage_memory, **self.peaks ())
-                self.__popen.kill ()
-
-            return Process.CONTINUE
+            self.__usage_time, self.__usage_memory, self.__peak_memory = self.__group.usage ()
+            if self.__profile is not None:
+                self.__record ()
+            return self.__verdict ()
+        try:  # так может случиться, что процесс завершится в самый интересный момент
+            with open ("/proc/%d/stat" % self.__pid, 'r') as f:
+                stats = f.readline ().split ()
+            with open ("/proc/%d/status" % self.__pid, 'r') as f:
+                status = dict (line.split (':', 1) for line in f)
         except IOError:
             return None
+        self.__usage_time = (int (stats[13]) + int (stats[14])) / \
+            os.sysconf (os.sysconf_names['SC_CLK_TCK'])
+        self.__usage_idle = time.time () - self.__start
+        try:
+            self.__usage_memory = int (status['VmRSS'].split ()[0]) * 1024
+            self.__peak_memory = max (self.__peak_memory, int (status['VmHWM'].split ()[0]) * 1024)
+        except KeyError:  # zombie
+            pass
+        if self.__profile is not None:
+            self.__record (status)
+        return self.__verdict ()
 
-    def kill ( self ):
-        return self.__popen.kill ()
+    def __record ( self, status=None ):
+        """ append current usage to profile, status: /proc/<pid>/status if it's read already """
+        try:
+            if status is None:
+                with open ("/proc/%d/status" % self.__pid, 'r') as f:
+                    status = dict (line.split (':', 1) for line in f)
+            with open ("/proc/%d/io" % self.__pid, 'r') as f:
+                io = dict (line.split (':', 1) for line in f)
+            vsz = int (status['VmSize'].split ()[0]) * 1024
+            read, write = int (io['rchar']), int (io['wchar'])
+        except (IOError, KeyError):
+            vsz = read = write = None
+        sample = (
+            round (self.__usage_idle, 6), self.__usage_time, self.__usage_memory,
+            vsz, read, write
+        )
+        self.__profile.append (sample)
+
+    def __verdict ( self ):
+        result = self.__limits ()
+        if result is not None:
+            self.kill ()
+            self.wait ()
+            self.__result = result
+        return result
+
+    def timeout ( self ):
+        """ time until next limit deadline (or next sampling) """
+        timeout = Process.SAMPLE_PROFILE
+        if self.__pidfd is not None and self.__profile is None:
+            timeout = Process.SAMPLE
+        if self.__limit_time is not None:
+            timeout = min (timeout, self.__limit_time - self.__usage_time)
+        if self.__limit_idle is not None:
+            timeout = min (timeout, self.__limit_idle - (time.time () - self.__start))
+        return max (timeout, 1 / os.sysconf (os.sysconf_names['SC_CLK_TCK']))
+
+    def close ( self ):
+        if self.__pidfd is not None:
+            os.close (self.__pidfd)
+            self.__pidfd = None
+        if self.__group is not None:
+            self.__group.close ()
 
-    def communicate ( self, *args, **kwargs ):
-        return self.__popen.communicate (*args, **kwargs)
+    def kill ( self ):
+        if self.__group is not None:
+            self.__group.kill ()
+        # never use Popen.kill: it may reap the process and lose its rusage
+        if self.__result is not None:
+            return
+        try:
+            os.kill (self.__pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
 
 
 class Runner (Module):
@@ -125,46 +261,63 @@ class Runner (Module):
         process = Process (command, stdin=stdin, stdout=stdout, stderr=stderr, **kwargs)
         if not wait:
             return process
-        outputs = None
+        selector = selectors.DefaultSelector ()
+        for x in [process] + ([interactor] if interactor is not None else []):
+            if x.pidfd is not None:
+                selector.register (x.pidfd, selectors.EVENT_READ, None)
+        for fd in process.pipes:
+            selector.register (fd, selectors.EVENT_READ, process)
         try:
-            time_cpu = 0.0
-            while True:
-                result_process = process.check ()
-                if result_process is None:
-                    continue
-                if isinstance (result_process, (RunResult, int)):
+            result_process = None
+            interactor_finish = None
+            while result_process is None:
+                # wake up on exit, pipe data or next limit deadline
+                timeout = process.timeout ()
+                if interactor_finish is not None:
+                    deadline = interactor_finish + Process.SAMPLE
+                    timeout = max (0, min (timeout, deadline - time.time ()))
+                for key, events in selector.select (timeout):
+                    if key.data is not None and not key.data.read (key.fd):
+                        selector.unregister (key.fd)
+                result_process = process.poll ()
+                if result_process is not None:
+                    break
+                result_process = process.sample ()
+                if result_process is not None:
+                    break
+                if interactor is not None and interactor_finish is None \
+                        and interactor.poll () is not None:
+                    # self._log.debug ("interactor result: ", interactor.poll ())
+                    if interactor.pidfd is not None:
+                        selector.unregister (interactor.pidfd)
+                    interactor_finish = time.time ()
+                if interactor_finish is not None \
+                        and time.time () > interactor_finish + Process.SAMPLE:
+                    # interactor has finished, solution had some time to do the same
+                    process.kill ()
+                    result_process = process.wait ()
                     break
-                if interactor is not None:
-                    result_interactor = interactor.check ()
-                    if result_interactor is None:
-                        continue
-                    # self._log.debug ("interactor result: ", result_interactor)
-                    if isinstance (result_interactor, (RunResult, int)):
-                        process.kill ()
                 if verbose:
                     line = "%.3fs, %.2fMiB" % (process.usage_time, process.usage_memory / 2**20)
                     line = line + '\b' * len (line)
                     self._t.log (line, prefix=False, end='')
-                try:
-                    outputs = process.communicate (timeout=0.01)
-                except subprocess.TimeoutExpired:
-                    pass
-                if interactor is not None:
-                    try:
-                        # self._log.debug ("interactor.communicate")
-                        interactor.communicate (timeout=0)
-                    except subprocess.TimeoutExpired:
-                        pass
+            # read the rest of output, somebody else may hold pipe, so don't wait forever
+            deadline = time.time () + process.timeout ()
+            while process.pipes and time.time () < deadline:
+                for key, events in selector.select (deadline - time.time ()):
+                    if key.data is not None and not key.data.read (key.fd):
+                        selector.unregister (key.fd)
             if interactor is not None:
-                interactor.communicate ()
-                result_interactor = interactor.check ()
+                result_interactor = interactor.wait ()
         finally:
+            selector.close ()
             if interactor is not None:
                 interactor.kill ()
+                interactor.close ()
             process.kill ()
-        
-        if outputs is None:
-            outputs = process.communicate ()
+            process.close ()
+
+        outputs = process.outputs ()
         if isinstance (result_process, int) and result_process:
             result_process = RunResult.runtime (result_process, 'exit code: %d' % result_process, outputs=outputs, **process.peaks ())
         if isinstance (result_process, int) and result_process == 0:
@@ -181,4 +334,3 @@ class Runner (Module):
             assert type (result_interactor) is RunResult
             return (result_interactor, result_process)
         return result_process
-
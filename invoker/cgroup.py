@@ -0,0 +1,178 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import itertools
+import os
+import signal
+import time
+
+from . import advanced
+
+
+PIDS = 1024  # jvm likes threads
+
+
+def cgroup_own ():
+    with open ('/proc/self/cgroup', 'r') as f:
+        for line in f:
+            hierarchy, controllers, path = line.rstrip ('\n').split (':', 2)
+            if hierarchy == '0':
+                return path
+    return None
+
+
+def cgroup_mount ():
+    """ mount point and root of cgroup v2 hierarchy """
+    with open ('/proc/self/mountinfo', 'r') as f:
+        for line in f:
+            fields, info = line.split (' - ', 1)
+            fields = fields.split ()
+            if info.split ()[0] == 'cgroup2':
+                return fields[4], fields[3]
+    return None
+
+
+def delegated ():
+    """
+        path to cgroup v2 subtree we're allowed to manage: $T_CGROUP or our own cgroup
+        returns None if there is no such subtree
+    """
+    path = os.environ.get ('T_CGROUP')
+    try:
+        if path is None:
+            own, mount = cgroup_own (), cgroup_mount ()
+            if own is None or mount is None:
+                return None
+            mountpoint, root = mount
+            path = os.path.join (mountpoint, os.path.relpath (own, root))
+        with open (os.path.join (path, 'cgroup.controllers'), 'r') as f:
+            controllers = set (f.read ().split ())
+    except OSError:
+        return None
+    if not {'memory', 'pids'} <= controllers:
+        return None
+    if not os.access (os.path.join (path, 'cgroup.subtree_control'), os.W_OK):
+        return None
+    return path
+
+
+def available ():
+    return delegated () is not None
+
+
+class Group:
+    """ cgroup for single run """
+    def __init__ ( self, path, *, limit_memory=None ):
+        os.mkdir (path)
+        self.__path = path
+        self.__peak = 0
+        self.__closed = False
+        if limit_memory is not None:
+            self.__write ('memory.max', limit_memory)
+            try:
+                self.__write ('memory.swap.max', 0)
+            except FileNotFoundError:  # no swap accounting
+                pass
+        self.__write ('pids.max', PIDS)
+
+    def __read ( self, name ):
+        with open (os.path.join (self.__path, name), 'r') as f:
+            return f.read ()
+
+    def __keys ( self, name ):
+        return dict (line.split () for line in self.__read (name).splitlines ())
+
+    def __write ( self, name, value ):
+        with open (os.path.join (self.__path, name), 'w') as f:
+            f.write (str (value))
+
+    def command ( self, command ):
+        # process moves itself into cgroup before exec, so nothing is charged elsewhere
+        procs = os.path.join (self.__path, 'cgroup.procs')
+        return ['/bin/sh', '-c', 'echo 0 > "$0" && exec "$@"', procs] + list (command)
+
+    def usage ( self ):
+        """ cpu time of whole process tree, current and peak memory """
+        cpu = int (self.__keys ('cpu.stat')['usage_usec']) / 10**6
+        memory = int (self.__read ('memory.current'))
+        try:
+            peak = int (self.__read ('memory.peak'))
+        except FileNotFoundError:  # before linux 5.19
+            peak = memory
+        self.__peak = max (self.__peak, peak)
+        return cpu, memory, self.__peak
+
+    def oom ( self ):
+        return int (self.__keys ('memory.events').get ('oom_kill', 0)) > 0
+
+    def kill ( self ):
+        if self.__closed:
+            return
+        try:
+            self.__write ('cgroup.kill', 1)
+            return
+        except FileNotFoundError:  # before linux 5.14
+            pass
+        for pid in self.__read ('cgroup.procs').split ():
+            try:
+                os.kill (int (pid), signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def close ( self ):
+        if self.__closed:
+            return
+        self.__closed = True
+        self.kill ()
+        deadline = time.time () + 1.0
+        while self.__keys ('cgroup.events').get ('populated') != '0' and time.time () < deadline:
+            time.sleep (0.001)
+        os.rmdir (self.__path)
+
+
+class Runner (advanced.Runner):
+    def __init__ ( self, *, t ):
+        super (Runner, self).__init__ (t=t)
+        self.__root = delegated ()
+        if self.__root is None:
+            raise self._error ("no delegated cgroup v2 subtree")
+        # cgroup with processes can't distribute controllers, so move ourselves into leaf
+        procs = os.path.join (self.__root, 'cgroup.procs')
+        with open (procs, 'r') as f:
+            if str (os.getpid ()) in f.read ().split ():
+                supervisor = os.path.join (self.__root, 'supervisor')
+                os.makedirs (supervisor, exist_ok=True)
+                with open (os.path.join (supervisor, 'cgroup.procs'), 'w') as g:
+                    g.write ('0')
+        with open (os.path.join (self.__root, 'cgroup.subtree_control'), 'w') as f:
+            f.write ('+memory +pids')
+        self.__counter = itertools.count ()
+
+    def run ( self, command, *, limit_memory=None, **kwargs ):
+        group = Group (
+            os.path.join (self.__root, 'run-%d-%d' % (os.getpid (), next (self.__counter))),
+            limit_memory=limit_memory
+        )
+        try:
+            return super (Runner, self).run (
+                command, group=group, limit_memory=limit_memory, **kwargs
+            )
+        except:
+            group.close ()
+            raise
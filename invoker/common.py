@@ -29,12 +29,17 @@ class RunResult:
     class OK:
         pass
 
-    def __init__ ( self, result, exitcode, comment=None, *, peak_time, peak_memory, outputs=(b'', b'') ):
+    def __init__ (
+        self, result, exitcode, comment=None, *,
+        peak_time, peak_memory, outputs=(b'', b''), profile=None
+    ):
+        """ profile: samples of resource usage during the run, if recorded (see usage.Series) """
         self.__result = result
         self.__exitcode = exitcode
         self.__comment = comment
         self.__peak_time = peak_time
         self.__peak_memory = peak_memory
+        self.__profile = profile
         self.__stdout, self.__stderr = map (lambda x: x.decode ('utf8') if x is not None else None, outputs)
 
     value = property (lambda self: self.__result)
@@ -43,6 +48,7 @@ class RunResult:
     stderr = property (lambda self: self.__stderr)
     time = property (lambda self: self.__peak_time)
     memory = property (lambda self: self.__peak_memory)
+    profile = property (lambda self: self.__profile)
 
     def __bool__ ( self ):
         return self.__result is RunResult.OK
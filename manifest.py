@@ -0,0 +1,95 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import hashlib
+import json
+import os
+
+from source import Source
+
+
+class Manifest:
+    """
+        what previous builds have done: which tests were validated by which validator
+        and which answers were generated by which model solution
+    """
+    def __init__ ( self, path ):
+        self.__path = path
+        try:
+            with open (path, 'r') as f:
+                data = json.load (f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        self.__hashes = data.get ('hashes', {})  # path -> [size, mtime, hash], to avoid rehashing
+        self.__tests = data.get ('tests', {})
+
+    def hash ( self, path ):
+        stat = os.stat (path)
+        cached = self.__hashes.get (path)
+        if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        value = hashlib.sha256 ()
+        with open (path, 'rb') as f:
+            for block in iter (lambda: f.read (1 << 20), b''):
+                value.update (block)
+        value = value.hexdigest ()
+        self.__hashes[path] = [stat.st_size, stat.st_mtime_ns, value]
+        return value
+
+    def tool ( self, *sources ):
+        """ fingerprint of tools: hash of their sources """
+        result = []
+        for source in sources:
+            if source is None:
+                result.append ('-')
+            elif isinstance (source, Source):
+                path = source.path
+                if source.directory is not None:
+                    path = os.path.join (source.directory, source.path)
+                result.append (self.hash (path))
+            else:
+                result.append (str (source))
+        return ':'.join (result)
+
+    def __record ( self, test ):
+        return self.__tests.setdefault (test.path, {})
+
+    def validated ( self, test, validator ):
+        record = self.__tests.get (test.path, {})
+        return record.get ('validated') == [self.hash (test.path), validator]
+
+    def validate ( self, test, validator ):
+        self.__record (test)['validated'] = [self.hash (test.path), validator]
+
+    def stale ( self, test, solution ):
+        """ answer was generated by us, but for other input or with other solution """
+        answered = self.__tests.get (test.path, {}).get ('answered')
+        if answered is None:
+            return False  # answer came from somewhere else, trust it
+        return answered != [self.hash (test.path), solution, self.hash (test.answer.path)]
+
+    def answer ( self, test, solution ):
+        answered = [self.hash (test.path), solution, self.hash (test.answer.path)]
+        self.__record (test)['answered'] = answered
+
+    def save ( self ):
+        os.makedirs (os.path.dirname (self.__path) or '.', exist_ok=True)
+        with open (self.__path + '.new', 'w') as f:
+            json.dump ({'hashes': self.__hashes, 'tests': self.__tests}, f)
+        os.replace (self.__path + '.new', self.__path)
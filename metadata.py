@@ -0,0 +1,124 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import hashlib
+import json
+import os
+import stat
+
+
+class Metadata:
+    """
+        persistent per-problem cache of values derived from problem files
+        (what was found in problem.sh, makefile etc.),
+        every value is valid while its files have the same content
+    """
+    def __init__ ( self, directory ):
+        self.__directory = directory
+        self.__problems = {}
+
+    @staticmethod
+    def __hash ( path ):
+        value = hashlib.sha256 ()
+        with open (path, 'rb') as f:
+            for block in iter (lambda: f.read (1 << 20), b''):
+                value.update (block)
+        return value.hexdigest ()
+
+    def __path ( self, problem ):
+        name = hashlib.sha256 (problem.encode ('utf8')).hexdigest ()[:32]
+        return os.path.join (self.__directory, name + '.json')
+
+    def __load ( self, problem ):
+        problem = os.path.abspath (problem)
+        if problem not in self.__problems:
+            data = {}
+            try:
+                with open (self.__path (problem), 'r') as f:
+                    data = json.load (f)
+            except (FileNotFoundError, ValueError):
+                pass
+            if data.get ('path') != problem:
+                data = {'path': problem, 'values': {}}
+            self.__problems[problem] = data
+        return self.__problems[problem]
+
+    def __stamp ( self, path, old=None ):
+        """
+            [size, mtime, hash] of file, hash is recalculated only when size or mtime is changed;
+            directory has only mtime, it changes when files are created, removed or renamed
+        """
+        try:
+            info = os.stat (path)
+        except FileNotFoundError:
+            return None
+        if stat.S_ISDIR (info.st_mode):
+            return ['directory', info.st_mtime_ns]
+        if old is not None and old[:2] == [info.st_size, info.st_mtime_ns]:
+            return old
+        return [info.st_size, info.st_mtime_ns, Metadata.__hash (path)]
+
+    def get ( self, problem, name, files=None ):
+        """
+            cached value, None if there is no value or some of files has changed;
+            files=None means the files value was calculated from last time
+        """
+        if self.__directory is None:
+            return None
+        data = self.__load (problem)
+        record = data['values'].get (name)
+        if record is None or (files is not None and sorted (record['files']) != sorted (files)):
+            return None
+        changed = False
+        for path, old in record['files'].items ():
+            stamp = self.__stamp (os.path.join (data['path'], path), old)
+            if stamp == old:
+                continue
+            if stamp is None or old is None:
+                return None
+            if 'directory' in (stamp[0], old[0]) or stamp[2] != old[2]:
+                return None
+            record['files'][path] = stamp  # touched but not changed
+            changed = True
+        if changed:
+            self.__save (data)
+        return record['value']
+
+    def put ( self, problem, name, files, value ):
+        """ remember value calculated from files (relative to problem directory) """
+        if self.__directory is None:
+            return value
+        data = self.__load (problem)
+        data['values'][name] = {
+            'files': {path: self.__stamp (os.path.join (data['path'], path)) for path in files},
+            'value': value
+        }
+        self.__save (data)
+        return value
+
+    def __save ( self, data ):
+        try:
+            os.makedirs (self.__directory, exist_ok=True)
+            path = self.__path (data['path'])
+            temporary = '%s.%d' % (path, os.getpid ())
+            with open (temporary, 'w') as f:
+                json.dump (data, f)
+            os.rename (temporary, path)
+        except OSError:
+            pass  # cache is optional
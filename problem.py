@@ -19,87 +19,140 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import contextlib
 import os
 import os.path
 import shutil
 import subprocess
+import threading
+import time
 
-from tlib import Module, Log
+from tlib import Module, Log, stage
+from checker import CheckerSession
 from compilers import CompilationError
+from manifest import Manifest
 from settings import Settings
-from test import Answer
+from test import Answer, Test
+from usage import Series
 from verdict import Verdict
 
 class Problem (Module):
+    BATCH = 64  # max tests for single validator run
+    SHOWN = [
+        ('generator', 'generator'), ('validator', 'validator'),
+        ('checker', 'checker'), ('solution', 'solution_model')
+    ]
+
     def __init__ (
         self, path, *args, id,
         generator=None,
         validator=None,
+        validator_batch=False,
         interactor=None,
         checker=None,
         cleaner=None,
         solution_model=None,
         directory_source=None,
+        directory_solutions=None,
         directory_temp=None,
         directory_tests=None,
         defaults,
-        sources=[],
-        garbage=[],
+        sources=lambda: [],
+        garbage=lambda: [],
         **kwargs
     ):
         super (Problem, self).__init__ (*args, **kwargs)
         self.__path = path
         self.__path_canonical = os.path.abspath (path)
         self.__id = id
-        self.__generator = generator
-        self.__validator = validator
-        self.__interactor = interactor
-        self.__checker = checker
-        self.__cleaner = cleaner
-        self.__solution_model = solution_model
+        self.__components = {
+            'generator': generator,
+            'validator': validator,
+            'interactor': interactor,
+            'checker': checker,
+            'cleaner': cleaner,
+            'solution_model': solution_model,
+            'tests': None,
+        }
+        self.__lazy = {}
+        self.__lock = threading.RLock ()  # tests are resolved with generator, so lock is reentrant
+        self.__announced = False  # info was shown, components resolved before it are listed there
+        self.__validator_batch = validator_batch
         self.__directory_source = directory_source
+        self.__directory_solutions = directory_solutions
         self.__directory_temp = directory_temp
         self.__directory_tests = directory_tests
         self.__defaults = defaults
         self.__sources = sources
         self.__garbage = garbage
-        self.__tests = None
 
-    generator = property (lambda self: self.__generator)
+    def lazy ( self, name, function ):
+        """ component (generator, checker, tests etc.) will be found by function on first access """
+        self.__lazy[name] = function
+
+    def __component ( self, name ):
+        with self.__lock:
+            function = self.__lazy.pop (name, None)
+            if function is not None:
+                # resolution works in problem directory (changes cwd of whole process),
+                # so every command resolves components it needs before it starts workers
+                assert threading.current_thread () is threading.main_thread (), \
+                    "component %s of %s is resolved in worker thread" % (name, self.__id)
+                self.__components[name] = function ()
+                self.__show (name)
+            return self.__components[name]
+
+    def __set ( self, name, value ):
+        with self.__lock:
+            self.__lazy.pop (name, None)
+            self.__components[name] = value
+
+    def __show ( self, name ):
+        """ tell about component resolved after info (info shows only resolved ones) """
+        value = self.__components[name]
+        if not self.__announced or self._log.policy is Log.BRIEF or value is None:
+            return
+        for title, key in Problem.SHOWN:
+            if key == name:
+                self._log ('  * %s: %s' % (title, value))
+
+    generator = property (lambda self: self.__component ('generator'))
     @generator.setter
     def generator ( self, value ):
-        self.__generator = value
+        self.__set ('generator', value)
 
-    validator = property ()
+    validator = property (lambda self: self.__component ('validator'))
     @validator.setter
     def validator ( self, value ):
-        self.__validator = value
+        self.__set ('validator', value)
 
-    interactor = property ()
+    interactor = property (lambda self: self.__component ('interactor'))
     @interactor.setter
     def interactor ( self, value ):
-        self.__interactor = value
+        self.__set ('interactor', value)
 
-    checker = property ()
+    checker = property (lambda self: self.__component ('checker'))
     @checker.setter
     def checker ( self, value ):
-        self.__checker = value
+        self.__set ('checker', value)
 
-    cleaner = property ()
+    cleaner = property (lambda self: self.__component ('cleaner'))
     @cleaner.setter
     def cleaner ( self, value ):
-        self.__cleaner = value
+        self.__set ('cleaner', value)
 
-    solution_model = property (lambda self: self.__solution_model)
+    solution_model = property (lambda self: self.__component ('solution_model'))
     @solution_model.setter
     def solution_model ( self, value ):
-        self.__solution_model = value
+        self.__set ('solution_model', value)
 
+    path = property (lambda self: self.__path)
     defaults = property (lambda self: self.__defaults)
-    tests = property (lambda self: self.__tests)
+    directory_solutions = property (lambda self: self.__directory_solutions)
+    tests = property (lambda self: self.__component ('tests'))
     @tests.setter
     def tests ( self, value ):
-        self.__tests = value
+        self.__set ('tests', value)
 
     def __str__ ( self ):
         return self.__id
@@ -119,14 +172,17 @@ class Problem (Module):
                     else:
                         return "%.2f %s" % (x / k, suffix)
                 k *= 1024
+        with self.__lock:  # components which aren't resolved yet are shown when they are
+            self.__announced = True
+            components = [
+                (title, self.__components[key], nop)
+                for title, key in Problem.SHOWN if key not in self.__lazy
+            ]
         for name, value, filt in [
             ('path', self.__path_canonical, nop),
             ('time limit', self.__defaults.limit_time, nop),
             ('memory limit', self.__defaults.limit_memory, humansize),
-            ('generator', self.__generator, nop),
-            ('validator', self.__validator, nop),
-            ('checker', self.__checker, nop),
-            ('solution', self.__solution_model, nop),
+        ] + components + [
             ('input', self.__defaults.filename_input, nop),
             ('output', self.__defaults.filename_output, nop),
         ]:
@@ -134,23 +190,27 @@ class Problem (Module):
                 continue
             self._log ('  * %s: %s' % (name, filt (value)))
 
-    def build ( self ):
+    def build ( self, keep_going=False ):
         self._t.run_prepare ()
         dir_old = os.getcwd ()
         os.chdir (self.__path_canonical)
         try:
             if self._log.policy is not Log.BRIEF:
                 self._log ('== build “%s” ==' % self.__id)
-            if self.__solution_model is None:
+            if self.solution_model is None:
                 self._log.warning ('model solution not set')
-            self._t.ensure (self.__generator is not None, "[problem %s]: no generator" % self.__id)
-            self.__tests = self.__generator.run ()
+            self._t.ensure (self.generator is not None, "[problem %s]: no generator" % self.__id)
+            self.tests = self.generator.run ()
             if self._log.policy is not Log.BRIEF:
-                self._log ("total tests: %d" % len (self.__tests))
-            self.testset_validate ()
-            self.testset_answers ()
+                self._log ("total tests: %d" % len (self.tests))
+            manifest = Manifest (os.path.join (self.__directory_temp, 'manifest'))
+            try:
+                self.testset_validate (manifest, keep_going)
+                self.testset_answers (manifest)
+            finally:
+                manifest.save ()
             if self._log.policy is Log.BRIEF:
-                self._log ("build finished, total tests: %d" % len (self.__tests))
+                self._log ("build finished, total tests: %d" % len (self.tests))
         finally:
             os.chdir (dir_old)
 
@@ -162,19 +222,17 @@ class Problem (Module):
             if self._log.policy is not Log.BRIEF:
                 self._log ('== clean “%s” ==' % self.__id)
             try:
-                for filename in os.listdir (self.__directory_temp):
-                    os.remove (os.path.join (self.__directory_temp, filename))
-                os.rmdir (self.__directory_temp)
+                shutil.rmtree (self.__directory_temp)
             except FileNotFoundError:
                 pass
-            if self.__cleaner is not None:
-                result = self.__cleaner.run ()
+            if self.cleaner is not None:
+                result = self.cleaner.run ()
                 if not result:
                     self._log.error ('cleaner failed: ', result)
                 return
             if remove_tests:
-                if self.__tests is not None:
-                    for test in self.__tests:
+                if self.tests is not None:
+                    for test in self.tests:
                         os.remove (test.path)
                         os.remove (test.answer.path)
                 if self.__directory_tests is not None and self.__directory_tests != self.__directory_source:
@@ -182,7 +240,7 @@ class Problem (Module):
                         os.rmdir (self.__directory_tests)
                     except FileNotFoundError:
                         pass
-            for source in self.__sources:
+            for source in self.__sources ():
                 if source is None:
                     continue
                 if source.executable is None:
@@ -190,7 +248,7 @@ class Problem (Module):
                 if source.path == source.executable.path:
                     continue
                 os.remove (source.executable.path)
-            for filename in self.__garbage:
+            for filename in self.__garbage ():
                 try:
                     os.remove (filename)
                 except FileNotFoundError:
@@ -198,78 +256,162 @@ class Problem (Module):
         finally:
             os.chdir (dir_old)
 
-    def testset_validate ( self ):
+    def testset_validate ( self, manifest=None, keep_going=False ):
+        """
+            validate tests, with manifest skip tests already validated by the same validator;
+            validator which supports batches gets many tests at once: validator --batch <test>...
+            and exits with zero code iff all of them are correct
+        """
         self._t.run_prepare ()
-        if self.__validator is None:
+        if self.validator is None:
             return self._log.warning ("validator not set")
-        self.__validator.compile ()
+        self.validator.compile ()
+        validator = None if manifest is None else manifest.tool (self.validator)
+
+        def validate ( slot, tests ):
+            if len (tests) > 1:
+                result = self.validator.run (['--batch'] + [test.path for test in tests])
+                if result:
+                    return [result] * len (tests)
+                # somebody in batch is wrong, find out who
+            return [self.validator.run ([test.path], stdin=test.path) for test in tests]
+
         if self._log.policy is not Log.BRIEF:
             self._log ('validate tests', end='')
-        for test in self.__tests:
-            if self._log.policy is not Log.BRIEF:
-                self._log ('.', prefix=False, end='')
-            result = self.__validator.run ([test.path], stdin=test.path)
-            if not result:
-                raise self._error ('validation failed: %s' % (test))
+        tests = []
+        for test in self.tests:
+            if manifest is not None and manifest.validated (test, validator):
+                if self._log.policy is not Log.BRIEF:
+                    self._log ('+', prefix=False, end='')
+                continue
+            tests.append (test)
+        workers = self._workers (None)
+        size = 1
+        if self.__validator_batch:
+            size = max (1, min (Problem.BATCH, -(-len (tests) // workers.jobs)))
+        batches = [tests[i:i + size] for i in range (0, len (tests), size)]
+        failures = []
+        with contextlib.closing (workers.map (validate, batches)) as results:
+            for batch, outcome in zip (batches, results):
+                for test, result in zip (batch, outcome):
+                    if self._log.policy is not Log.BRIEF:
+                        self._log ('.', prefix=False, end='')
+                    if not result:
+                        if not keep_going:
+                            raise self._error ('validation failed: %s' % test)
+                        failures.append (test)
+                        continue
+                    if manifest is not None:
+                        manifest.validate (test, validator)
+        if failures:
+            raise self._error ('validation failed: %s' % ', '.join (map (str, failures)))
         if self._log.policy is not Log.BRIEF:
             self._log ('done', prefix=False)
 
-    def testset_answers ( self ):
-        """ generate answers using model solution """
+    def testset_answers ( self, manifest=None ):
+        """ generate answers using model solution, with manifest regenerate stale answers too """
         self._t.run_prepare ()
-        solution = self.__solution_model
+        solution = self.solution_model
+        tool = None if manifest is None else manifest.tool (solution, self.interactor)
         if solution is not None:
             solution.compile ()
-            if self.__interactor is not None:
-                self.__interactor.compile ()
-            input_name = os.path.join (self.__directory_temp, solution.filename_input if type (solution.filename_input) is str else 'input')
-            output_name = os.path.join (self.__directory_temp, solution.filename_output if type (solution.filename_output) is str else 'output')
+            if self.interactor is not None:
+                self.interactor.compile ()
 
-        try:
-            os.mkdir (self.__directory_temp)
-        except FileExistsError:
-            pass
+        def generate ( slot, item ):
+            test, fresh = item
+            if fresh or solution is None:
+                return None
+            input_name, output_name = self.__stage (solution, test, slot.directory)
+            result_interactor, result = self.__solution_run (
+                solution, slot.directory, input_name, output_name
+            )
+            if result_interactor and result:
+                shutil.move (output_name, test.path + '.a')
+            return result_interactor, result
 
         if self._log.policy is not Log.BRIEF:
             self._log ('generate answers', end='')
-        for test in self.__tests:
-            if test.answer is not None:
+        fresh = [
+            test.answer is not None and (manifest is None or not manifest.stale (test, tool))
+            for test in self.tests
+        ]
+        workers = self._workers (self.__directory_temp)
+        with contextlib.closing (workers.map (generate, zip (self.tests, fresh))) as results:
+            for test, kept, outcome in zip (self.tests, fresh, results):
+                if kept:
+                    if self._log.policy is not Log.BRIEF:
+                        self._log ('+', prefix=False, end='')
+                    continue
                 if self._log.policy is not Log.BRIEF:
-                    self._log ('+', prefix=False, end='')
-                continue
-            if self._log.policy is not Log.BRIEF:
-                self._log ('.', prefix=False, end='')
-            if solution is None:
-                raise self._error ('no solution')
-            shutil.copy (test.path, input_name)
-            result_interactor = True
-            if self.__interactor is not None:
-                pipe_sr, pipe_iw = os.pipe ()
-                pipe_ir, pipe_sw = os.pipe ()
-                interactor = self.__interactor.run (
-                    [os.path.basename (input_name), os.path.basename (output_name)],
-                    wait=False,
-                    directory=self.__directory_temp,
-                    stdin=pipe_ir, stdout=pipe_iw
-                )
-                (result_interactor, result) = solution.run (
-                    directory=self.__directory_temp,
-                    interactor=interactor,
-                    stdin=pipe_sr, stdout=pipe_sw
-                )
-            else:
-                result = solution.run (
-                    directory=self.__directory_temp,
-                    stdin=None if type (solution.filename_input) is str else input_name,
-                    stdout=None if type (solution.filename_output) is str else output_name,
-                )
-            if not result_interactor or not result:
-                raise self._error ("solution failed [test: %s]: %s" % (test, result))
-            shutil.copy (output_name, test.path + '.a')
-            test.answer = Answer (test.path + '.a', test)
+                    self._log ('.', prefix=False, end='')
+                if solution is None:
+                    raise self._error ('no solution')
+                result_interactor, result = outcome
+                if not result_interactor or not result:
+                    raise self._error ("solution failed [test: %s]: %s" % (test, result))
+                test.answer = Answer (test.path + '.a', test)
+                if manifest is not None:
+                    manifest.answer (test, tool)
         if self._log.policy is not Log.BRIEF:
             self._log ('done', prefix=False)
 
+    def __filenames ( self, solution, directory ):
+        name = lambda filename, default: filename if type (filename) is str else default
+        return (
+            os.path.join (directory, name (solution.filename_input, 'input')),
+            os.path.join (directory, name (solution.filename_output, 'output'))
+        )
+
+    def __stage ( self, solution, test, directory ):
+        """
+            prepare directory for run on test, returns (input, output) file names;
+            input is staged for every run, as previous solution may have changed it
+        """
+        input_name, output_name = self.__filenames (solution, directory)
+        try:  # never check output of previous run
+            os.remove (output_name)
+        except FileNotFoundError:
+            pass
+        if self.interactor is None and type (solution.filename_input) is not str:
+            return test.path, output_name  # solution reads stdin, so test itself is fine
+        stage (test.path, input_name)
+        return input_name, output_name
+
+    def __solution_run ( self, solution, directory, input_name, output_name, **kwargs ):
+        """ run solution (and interactor) in directory, returns (result_interactor, result) """
+        if self.interactor is None:
+            result = solution.run (
+                directory=directory,
+                stdin=None if type (solution.filename_input) is str else input_name,
+                stdout=None if type (solution.filename_output) is str else output_name,
+                **kwargs
+            )
+            return True, result
+        pipe_sr, pipe_iw = os.pipe ()
+        pipe_ir, pipe_sw = os.pipe ()
+        try:
+            interactor = self.interactor.run (
+                [os.path.basename (input_name), os.path.basename (output_name)],
+                wait=False,
+                directory=directory,
+                stdin=pipe_ir, stdout=pipe_iw
+            )
+        finally:
+            # leave interactor's ends to interactor only, so solution gets EOF when it finishes
+            os.close (pipe_ir)
+            os.close (pipe_iw)
+        try:
+            return solution.run (
+                directory=directory,
+                interactor=interactor,
+                stdin=pipe_sr, stdout=pipe_sw,
+                **kwargs
+            )
+        finally:
+            os.close (pipe_sr)
+            os.close (pipe_sw)
+
     def solution_check ( self, solution, keep_going=False ):
         assert solution is not None
         self._t.run_prepare ()
@@ -278,102 +420,378 @@ class Problem (Module):
         try:
             if self._log.policy is not Log.BRIEF:
                 self._log ('== check “%s” solution: %s ==' % (self.__id, solution))
-            if self.__tests is None:
+            if not self.tests:  # verdict is made of peaks over tests, so there must be some
                 raise self._error ("no tests")
-            if self.__checker is None:
+            if self.checker is None:
                 raise self._error ("no checker")
-            self.__checker.compile ()
+            self.checker.compile ()
             try:
                 solution.compile ()
             except CompilationError as error:
                 if self._log.policy is Log.BRIEF:
                     return Verdict.ce ()
                 raise error from error
-            if self.__interactor is not None:
-                self.__interactor.compile ()
+            if self.interactor is not None:
+                self.interactor.compile ()
 
-            try:
-                os.mkdir (self.__directory_temp)
-            except FileExistsError:
-                pass
+            brief = self._log.policy is Log.BRIEF
+            pipeline = self._t.pipeline
+            workers = self._workers (self.__directory_temp)
+            checks = self.__checks ()
+            live = workers.jobs == 1 and not brief and not pipeline
+
+            def solve ( slot, item ):
+                i, test = item
+                if live:
+                    self._log ('test #%d [%s] ' % (i, test.path), end='')
+                input_name, output_name = self.__stage (solution, test, slot.directory)
+                result_interactor, result = self.__solution_run (
+                    solution, slot.directory, input_name, output_name,
+                    verbose=live,
+                    cpu=slot.cpu,
+                    profile=self._t.profile,
+                    limit_time=solution.limit_time,
+                    limit_idle=solution.limit_idle,
+                    limit_memory=solution.limit_memory
+                )
+                self.__profile_save (solution, test, result)
+                if pipeline and result_interactor and result:
+                    # next run in this slot starts before check, so move output out of its way
+                    pending = '%s.%d' % (output_name, i)
+                    try:
+                        os.rename (output_name, pending)
+                    except FileNotFoundError:
+                        pass
+                    input_name, output_name = test.path, pending
+                return result_interactor, result, input_name, output_name
 
-            input_name = os.path.join (self.__directory_temp, solution.filename_input if type (solution.filename_input) is str else 'input')
-            output_name = os.path.join (self.__directory_temp, solution.filename_output if type (solution.filename_output) is str else 'output')
+            def check ( item, value ):
+                i, test = item
+                result_interactor, result, input_name, output_name = value
+                if not result_interactor or not result:
+                    return result_interactor, result, None
+                try:
+                    result_checker = checks.check (input_name, output_name, test.answer.path)
+                finally:
+                    if pipeline:
+                        discard (item, value)
+                return result_interactor, result, result_checker
+
+            def discard ( item, value ):
+                try:
+                    os.remove (value[3])
+                except FileNotFoundError:
+                    pass
+
+            if pipeline:
+                results = workers.pipeline (solve, check, enumerate (self.tests), discard=discard)
+            else:
+                results = workers.map (
+                    lambda slot, item: check (item, solve (slot, item)), enumerate (self.tests)
+                )
 
             verdict = None
             peak_time = None
             peak_memory = None
-            for i, test in enumerate (self.__tests):
-                shutil.copy (test.path, input_name)
-                if self._log.policy is not Log.BRIEF:
-                    self._log ('test #%d [%s] ' % (i, test.path), end='')
-                result_interactor = True
-                # self._log.debug ('run with interactor: ', self.__interactor)
-                if self.__interactor is not None:
-                    pipe_sr, pipe_iw = os.pipe ()
-                    pipe_ir, pipe_sw = os.pipe ()
-                    interactor = self.__interactor.run (
-                        [os.path.basename (input_name), os.path.basename (output_name)],
-                        wait=False,
-                        directory=self.__directory_temp,
-                        stdin=pipe_ir, stdout=pipe_iw
-                    )
-                    (result_interactor, result) = solution.run (
-                        directory=self.__directory_temp,
-                        interactor=interactor,
-                        stdin=pipe_sr, stdout=pipe_sw,
-                        verbose=self._log.policy is not Log.BRIEF,
-                        limit_time=solution.limit_time,
-                        limit_idle=solution.limit_idle,
-                        limit_memory=solution.limit_memory
-                    )
-                else:
-                    result = solution.run (
-                        directory=self.__directory_temp,
-                        stdin=None if type (solution.filename_input) is str else input_name,
-                        stdout=None if type (solution.filename_output) is str else output_name,
-                        verbose=self._log.policy is not Log.BRIEF,
-                        limit_time=solution.limit_time,
-                        limit_idle=solution.limit_idle,
-                        limit_memory=solution.limit_memory
-                    )
-                if peak_time is None or (result.time, i) > peak_time:
-                    peak_time = (result.time, i)
-                if peak_memory is None or (result.memory, i) > peak_memory:
-                    peak_memory = (result.memory, i)
-                if self._log.policy is not Log.BRIEF:
-                    self._log ('* ', prefix=False, end='')
-                if not result_interactor:
-                    if self._log.policy is not Log.BRIEF:
-                        self._log.error ("rejected by interactor: %s" % result_interactor)
-                    if verdict is None:
-                        verdict = Verdict.fail_solution (i + 1, result, peak_time=peak_time[0], peak_memory=peak_memory[0])
-                    if not keep_going:
-                        return verdict
-                    continue
-                if not result:
-                    if self._log.policy is not Log.BRIEF:
-                        self._log.error ('rejected: %s' % result)
-                    if verdict is None:
-                        verdict = Verdict.fail_solution (i + 1, result, peak_time=peak_time[0], peak_memory=peak_memory[0])
-                    if not keep_going:
-                        return verdict
-                    continue
-                result = self.__checker.run ([input_name, output_name, test.answer.path], stderr=subprocess.PIPE)
-                if self._log.policy is not Log.BRIEF:
-                    self._log (result.stderr.strip (), prefix=False)
-                if not result:
-                    if self._log.policy is not Log.BRIEF:
-                        self._log.error ('rejected by checker: %s' % result)
-                    if verdict is None:
-                        verdict = Verdict.fail_checker (i + 1, result, result.stderr.strip (), peak_time=peak_time[0], peak_memory=peak_memory[0])
-                    if not keep_going:
-                        return verdict
-                    continue
+            with checks, contextlib.closing (results):
+                for i, (test, outcome) in enumerate (zip (self.tests, results)):
+                    result_interactor, result, result_checker = outcome
+                    if peak_time is None or (result.time, i) > peak_time:
+                        peak_time = (result.time, i)
+                    if peak_memory is None or (result.memory, i) > peak_memory:
+                        peak_memory = (result.memory, i)
+                    if not brief:
+                        if not live:
+                            self._log ('test #%d [%s] [%.3fs, %.2fMiB] ' % (
+                                i, test.path, result.time, result.memory / 2**20
+                            ), end='')
+                        self._log ('* ', prefix=False, end='')
+                    if not result_interactor:
+                        if not brief:
+                            self._log.error ("rejected by interactor: %s" % result_interactor)
+                        if verdict is None:
+                            verdict = Verdict.fail_solution (
+                                i + 1, result, peak_time=peak_time[0], peak_memory=peak_memory[0]
+                            )
+                        if not keep_going:
+                            return verdict
+                        continue
+                    if not result:
+                        if not brief:
+                            self._log.error ('rejected: %s' % result)
+                        if verdict is None:
+                            verdict = Verdict.fail_solution (
+                                i + 1, result, peak_time=peak_time[0], peak_memory=peak_memory[0]
+                            )
+                        if not keep_going:
+                            return verdict
+                        continue
+                    if not brief:
+                        self._log (result_checker.stderr.strip (), prefix=False)
+                    if not result_checker:
+                        if not brief:
+                            self._log.error ('rejected by checker: %s' % result_checker)
+                        if verdict is None:
+                            verdict = Verdict.fail_checker (
+                                i + 1, result_checker, result_checker.stderr.strip (),
+                                peak_time=peak_time[0], peak_memory=peak_memory[0]
+                            )
+                        if not keep_going:
+                            return verdict
+                        continue
             if verdict is None:
                 verdict = Verdict.ok (peak_time=peak_time[0], peak_memory=peak_memory[0])
             return verdict
         finally:
             os.chdir (dir_old)
 
+    def __profile_path ( self, solution, test ):
+        name = str (solution).replace (os.sep, '_').replace (' ', '_')
+        return os.path.join (
+            self.__directory_temp, 'profile', name, os.path.basename (test) + '.json'
+        )
+
+    def __profile_save ( self, solution, test, result ):
+        """ keep resource usage of solution on test, if it was recorded """
+        if result.profile is None:
+            return
+        series = Series (
+            result.profile, solution=str (solution), test=test.path, result=str (result)
+        )
+        series.save (self.__profile_path (solution, test.path))
+
+    def profile ( self, solution, test ):
+        """ resource usage of solution on test (name or path) recorded by last profiling run """
+        path = os.path.join (self.__path_canonical, self.__profile_path (solution, test))
+        try:
+            return Series.load (path)
+        except FileNotFoundError:
+            raise self._error (
+                "no profile of %s on test %s, run check with --profile first" % (solution, test)
+            ) from None
+
+    def __checks ( self ):
+        """ session for many checks in a row (see CheckerSession) """
+        return CheckerSession (self.checker, server=self._t.checker_server, t=self)
+
+    def __verdict ( self, number, result_interactor, result, result_checker ):
+        """ verdict of single run on test with given number """
+        kwargs = {'peak_time': result.time, 'peak_memory': result.memory}
+        if not result_interactor or not result:
+            return Verdict.fail_solution (number, result, **kwargs)
+        if not result_checker:
+            return Verdict.fail_checker (
+                number, result_checker, result_checker.stderr.strip (), **kwargs
+            )
+        return Verdict.ok (comment=result_checker.stderr.strip (), **kwargs)
+
+    def solution_matrix ( self, solutions, keep_going=False ):
+        """
+            check all solutions on all tests at once: runs of all solutions share worker pool,
+            all of them run on one test before the next test; returns (verdicts, matrix),
+            where verdicts[j] is verdict of solutions[j] and matrix[i][j] is its verdict on test i
+            (None if it wasn't run: solution has failed earlier and keep_going is off)
+        """
+        self._t.run_prepare ()
+        dir_old = os.getcwd ()
+        os.chdir (self.__path_canonical)
+        try:
+            brief = self._log.policy is Log.BRIEF
+            if not brief:
+                self._log ('== matrix “%s”: %d solutions ==' % (self.__id, len (solutions)))
+            if not self.tests:  # verdict is made of peaks over tests, so there must be some
+                raise self._error ("no tests")
+            if self.checker is None:
+                raise self._error ("no checker")
+            self.checker.compile ()
+            if self.interactor is not None:
+                self.interactor.compile ()
+            failed = set ()  # indices of solutions which failed (or didn't compile)
+            for j, solution in enumerate (solutions):
+                try:
+                    solution.compile ()
+                except CompilationError as error:
+                    if not brief:
+                        self._log.error (error)
+                    failed.add (j)
+            broken = set (failed)
+            if not brief:
+                for j, solution in enumerate (solutions):
+                    failure = ' (compilation failed)' if j in broken else ''
+                    self._log ('  [%d] %s%s' % (j + 1, solution, failure))
+
+            workers = self._workers (self.__directory_temp)
+            checks = self.__checks ()
+
+            def run ( slot, item ):
+                i, test, j, solution = item
+                if j in broken or (j in failed and not keep_going):
+                    return None
+                input_name, output_name = self.__stage (solution, test, slot.directory)
+                result_interactor, result = self.__solution_run (
+                    solution, slot.directory, input_name, output_name,
+                    cpu=slot.cpu,
+                    profile=self._t.profile,
+                    limit_time=solution.limit_time,
+                    limit_idle=solution.limit_idle,
+                    limit_memory=solution.limit_memory
+                )
+                self.__profile_save (solution, test, result)
+                result_checker = None
+                if result_interactor and result:
+                    result_checker = checks.check (input_name, output_name, test.answer.path)
+                verdict = self.__verdict (i + 1, result_interactor, result, result_checker)
+                if not verdict:
+                    failed.add (j)
+                return verdict
+
+            tests = self.tests
+            items = [
+                (i, test, j, solution)
+                for i, test in enumerate (tests) for j, solution in enumerate (solutions)
+            ]
+            matrix = []
+            with checks, contextlib.closing (workers.map (run, items)) as results:
+                for i, test in enumerate (tests):
+                    row = [next (results) for solution in solutions]
+                    matrix.append (row)
+                    if not brief:
+                        self._log ('test #%d [%s] ' % (i, test.path), ' | '.join (
+                            '%-4s' % '-' if cell is None else '%-4s %6.3fs %7.2fMiB' % (
+                                str (cell).split ('/')[0], cell.peak_time, cell.peak_memory / 2**20
+                            ) for cell in row
+                        ))
+
+            verdicts = []
+            for j, solution in enumerate (solutions):
+                if j in broken:
+                    verdicts.append (Verdict.ce ())
+                    continue
+                cells = [row[j] for row in matrix if row[j] is not None]
+                peak = {
+                    'peak_time': max (cell.peak_time for cell in cells),
+                    'peak_memory': max (cell.peak_memory for cell in cells),
+                }
+                wrong = [cell for cell in cells if not cell]
+                if wrong:
+                    verdicts.append (Verdict (str (wrong[0]), False, wrong[0].comment, **peak))
+                else:
+                    verdicts.append (Verdict.ok (**peak))
+            return verdicts, matrix
+        finally:
+            os.chdir (dir_old)
+
+    def __scratch ( self ):
+        """ directory for short-lived files: tmpfs if there is one, temporary one otherwise """
+        import tempfile
+        for directory in ['/dev/shm', self.__directory_temp]:
+            try:
+                os.makedirs (directory, exist_ok=True)
+                return tempfile.mkdtemp (prefix='t.py-', dir=directory)
+            except OSError:
+                pass
+        raise self._error ("no place for temporary files")
+
+    def stress ( self, generator, solution, model, seeds ):
+        """
+            run generator (with seed as its only argument), model solution, solution and checker
+            for every seed in all workers until solution fails; returns (seed, verdict, path),
+            where path is where failed test is saved, or None if seeds are over
+        """
+        self._t.run_prepare ()
+        dir_old = os.getcwd ()
+        os.chdir (self.__path_canonical)
+        try:
+            brief = self._log.policy is Log.BRIEF
+            if not brief:
+                self._log ('== stress “%s”: %s against %s, tests by %s ==' % (
+                    self.__id, solution, model, generator
+                ))
+            if self.checker is None:
+                raise self._error ("no checker")
+            for source in [self.checker, self.interactor, generator, model, solution]:
+                if source is not None:
+                    source.compile ()
+
+            scratch = self.__scratch ()
+            workers = self._workers (scratch)
+            checks = self.__checks ()
+            stop = threading.Event ()
+            skipped = object ()  # outcome of seed which wasn't run, as other seed has failed
+            limits = lambda source: {
+                'limit_time': source.limit_time,
+                'limit_idle': source.limit_idle,
+                'limit_memory': source.limit_memory,
+            }
+
+            def iteration ( slot, seed ):
+                """ None if solution is fine on this seed, (seed, what failed, how) otherwise """
+                if stop.is_set ():
+                    return skipped
+                test = Test (os.path.join (slot.directory, 'test'))
+                result = generator.run (
+                    [str (seed)], directory=slot.directory, stdout=test.path,
+                    stderr=subprocess.DEVNULL, cpu=slot.cpu, **limits (generator)
+                )
+                if not result:
+                    stop.set ()
+                    return seed, 'generator', result
+                input_name, output_name = self.__stage (model, test, slot.directory)
+                result_interactor, result = self.__solution_run (
+                    model, slot.directory, input_name, output_name, cpu=slot.cpu, **limits (model)
+                )
+                if not result_interactor or not result:
+                    stop.set ()
+                    return seed, 'model solution', result if not result else result_interactor
+                test.answer = Answer (test.path + '.a', test)
+                os.replace (output_name, test.answer.path)
+                input_name, output_name = self.__stage (solution, test, slot.directory)
+                result_interactor, result = self.__solution_run (
+                    solution, slot.directory, input_name, output_name,
+                    cpu=slot.cpu, **limits (solution)
+                )
+                result_checker = None
+                if result_interactor and result:
+                    result_checker = checks.check (input_name, output_name, test.answer.path)
+                verdict = self.__verdict (1, result_interactor, result, result_checker)
+                if verdict:
+                    return None
+                stop.set ()  # failed test stays in slot, nothing else runs there any more
+                return seed, 'solution', (verdict, test)
+
+            start = report = time.time ()
+            count = 0
+            try:
+                with checks, contextlib.closing (workers.map (iteration, seeds)) as results:
+                    for outcome in results:
+                        if outcome is skipped:
+                            continue
+                        if outcome is None:
+                            count += 1
+                            if not brief and time.time () > report + 5:
+                                report = time.time ()
+                                speed = count / (report - start)
+                                self._log ('%d tests, %.1f tests/s' % (count, speed))
+                            continue
+                        seed, what, how = outcome
+                        if what != 'solution':
+                            raise self._error ("%s failed [seed: %d]: %s" % (what, seed, how))
+                        verdict, test = how
+                        directory = os.path.join (self.__directory_temp, 'stress')
+                        os.makedirs (directory, exist_ok=True)
+                        path = os.path.join (directory, str (seed))
+                        shutil.copy (test.path, path)
+                        shutil.copy (test.answer.path, path + '.a')
+                        return seed, verdict, path
+            finally:
+                if not brief:
+                    elapsed = max (time.time () - start, 1e-9)
+                    self._log ('%d tests passed in %.2fs, %.1f tests/s' % (
+                        count, elapsed, count / elapsed
+                    ))
+                shutil.rmtree (scratch, ignore_errors=True)
+            return None
+        finally:
+            os.chdir (dir_old)
+
 
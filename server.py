@@ -0,0 +1,261 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import json
+import os
+import socket
+import struct
+import sys
+
+
+def socket_default ():
+    """ where `t.py serve` listens by default """
+    if 'T_SOCKET' in os.environ:
+        return os.environ['T_SOCKET']
+    if 'XDG_RUNTIME_DIR' in os.environ:
+        return os.path.join (os.environ['XDG_RUNTIME_DIR'], 't.py.sock')
+    directory = os.environ.get ('XDG_CACHE_HOME', os.path.expanduser ('~/.cache'))
+    return os.path.join (directory, 't.py', 'serve.sock')
+
+
+class Watcher:
+    """ inotify watches on problem directories, tells which problems were changed """
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    IN_IGNORED = 0x8000
+    # modify, attrib, close_write, moved_from, moved_to, create, delete, delete_self, move_self
+    MASK = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200 | 0x400 | 0x800
+    SKIP = {'.temp', '.git', '.hg', '.svn', '__pycache__'}
+
+    def __init__ ( self ):
+        import ctypes
+        self.__libc = ctypes.CDLL (None, use_errno=True)
+        self.__fd = self.__libc.inotify_init1 (Watcher.IN_NONBLOCK | Watcher.IN_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError (ctypes.get_errno (), 'inotify_init1 failed')
+        self.__keys = {}  # watch descriptor -> key
+        self.__watches = {}  # key -> watch descriptors
+
+    def fileno ( self ):
+        return self.__fd
+
+    def watch ( self, key, path ):
+        """ watch path and its subdirectories (except temporary and VCS ones) for changes of key """
+        directories = [path]
+        for directory in directories:
+            wd = self.__libc.inotify_add_watch (self.__fd, os.fsencode (directory), Watcher.MASK)
+            if wd < 0:
+                continue
+            self.__keys[wd] = key
+            self.__watches.setdefault (key, []).append (wd)
+            try:
+                with os.scandir (directory) as entries:
+                    directories += [
+                        entry.path for entry in entries
+                        if entry.is_dir () and entry.name not in Watcher.SKIP
+                    ]
+            except OSError:
+                pass
+
+    def forget ( self, key ):
+        for wd in self.__watches.pop (key, []):
+            self.__keys.pop (wd, None)
+            self.__libc.inotify_rm_watch (self.__fd, wd)
+
+    def changed ( self ):
+        """ keys with changes since last call, they are forgotten """
+        keys = set ()
+        while True:
+            try:
+                data = os.read (self.__fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len (data):
+                wd, mask, cookie, size = struct.unpack_from ('iIII', data, offset)
+                name = data[offset + 16:offset + 16 + size].rstrip (b'\0')
+                offset += 16 + size
+                if mask & Watcher.IN_IGNORED or name == b".temp":
+                    continue
+                if wd in self.__keys:
+                    keys.add (self.__keys[wd])
+        for key in keys:
+            self.forget (key)
+        return keys
+
+
+class Problems:
+    """ opened problems kept by server, problem is dropped when its directory is changed """
+    def __init__ ( self, watcher ):
+        self.__watcher = watcher
+        self.__problems = {}
+
+    def get ( self, path ):
+        return self.__problems.get (path)
+
+    def put ( self, path, problem ):
+        if self.__watcher is None:
+            return  # nobody will tell us about changes
+        self.__problems[path] = problem
+        self.__watcher.watch ((self, path), path)
+
+    def drop ( self, path ):
+        self.__problems.pop (path, None)
+
+
+class Server:
+    """
+        accepts requests from client over unix socket: client sends its cwd and arguments,
+        along with its stdout and stderr, so all output goes directly to client
+    """
+    def __init__ ( self, path, execute ):
+        """ execute (arguments, problems) runs one request in current directory, returns code """
+        self.__path = path
+        self.__execute = execute
+        try:
+            self.__watcher = Watcher ()
+        except (OSError, AttributeError):
+            self.__watcher = None
+
+    watching = property (lambda self: self.__watcher is not None)
+
+    def problems ( self ):
+        return Problems (self.__watcher)
+
+    def serve ( self ):
+        import selectors
+        listener = socket.socket (socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.connect (self.__path)
+            raise OSError ("server is already running at '%s'" % self.__path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        try:
+            os.remove (self.__path)
+        except FileNotFoundError:
+            pass
+        os.makedirs (os.path.dirname (os.path.abspath (self.__path)), exist_ok=True)
+        listener = socket.socket (socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind (self.__path)
+        listener.listen ()
+        selector = selectors.DefaultSelector ()
+        selector.register (listener, selectors.EVENT_READ, None)
+        if self.__watcher is not None:
+            selector.register (self.__watcher.fileno (), selectors.EVENT_READ, self.__watcher)
+        try:
+            while True:
+                for key, events in selector.select ():
+                    if key.data is not None:
+                        self.__invalidate ()
+                        continue
+                    connection, address = listener.accept ()
+                    with connection:
+                        self.__invalidate ()  # don't miss changes made just before request
+                        try:
+                            self.__handle (connection)
+                        except OSError:
+                            pass  # client has gone
+        finally:
+            selector.close ()
+            listener.close ()
+            os.remove (self.__path)
+
+    def __invalidate ( self ):
+        if self.__watcher is None:
+            return
+        for problems, path in self.__watcher.changed ():
+            problems.drop (path)
+
+    def __handle ( self, connection ):
+        data = b''
+        fds = []
+        while not data.endswith (b'\n'):
+            chunk, received, flags, address = socket.recv_fds (connection, 1 << 16, 2)
+            if not chunk:
+                break
+            data += chunk
+            fds += received
+        if not data:
+            return  # somebody checks whether server is alive
+        directory = os.getcwd ()
+        try:
+            request = json.loads (data)
+            if not isinstance (request, dict) or not isinstance (request.get ('cwd'), str) \
+                    or not isinstance (request.get ('arguments'), list) \
+                    or not all (isinstance (x, str) for x in request['arguments']):
+                raise ValueError ("object with cwd and arguments expected")
+            if len (fds) != 2:
+                raise ValueError ("stdout and stderr expected")
+            os.chdir (request['cwd'])
+        except (ValueError, OSError) as error:  # bad request must not kill server for everybody
+            for fd in fds:
+                os.close (fd)
+            reply = {'code': 2, 'error': str (error)}
+            connection.sendall (json.dumps (reply).encode ('utf8') + b'\n')
+            return
+        saved = [os.dup (1), os.dup (2)], sys.stdout, sys.stderr
+        sys.stdout.flush ()
+        sys.stderr.flush ()
+        code = 1
+        try:
+            # children get client's descriptors, we get fresh streams
+            # (client may close them any moment)
+            os.dup2 (fds[0], 1)
+            os.dup2 (fds[1], 2)
+            sys.stdout = open (1, 'w', closefd=False)
+            sys.stderr = open (2, 'w', closefd=False)
+            code = self.__execute (request['arguments'])
+        finally:
+            for stream in sys.stdout, sys.stderr:
+                try:
+                    stream.close ()
+                except OSError:
+                    pass
+            descriptors, sys.stdout, sys.stderr = saved
+            os.dup2 (descriptors[0], 1)
+            os.dup2 (descriptors[1], 2)
+            for fd in descriptors + fds:
+                os.close (fd)
+            os.chdir (directory)
+        connection.sendall (json.dumps ({'code': code}).encode ('utf8') + b'\n')
+
+
+def client ( arguments, *, fallback ):
+    """ run t.py command on server, if there is no server run fallback (arguments) instead """
+    path = socket_default ()
+    if arguments[:1] == ['--socket']:
+        path, arguments = arguments[1], arguments[2:]
+    connection = socket.socket (socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect (path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return fallback (arguments)
+    with connection:
+        request = json.dumps ({'cwd': os.getcwd (), 'arguments': arguments}).encode ('utf8') + b'\n'
+        socket.send_fds (connection, [request], [1, 2])
+        data = b''
+        while not data.endswith (b'\n'):
+            chunk = connection.recv (1 << 16)
+            if not chunk:
+                return 1  # server died
+            data += chunk
+    response = json.loads (data)
+    if 'error' in response:
+        print ("t.py: bad request: %s" % response['error'], file=sys.stderr)
+    return response['code']
@@ -21,6 +21,7 @@
 
 
 from tlib import Module
+from compilers import CompilationError
 
 
 class Source (Module):
@@ -31,6 +32,7 @@ class Source (Module):
         self.__name = name
         self.__directory = directory
         self.__compiled = None
+        self.__failure = None
 
     path = property (lambda self: self.__path)
     directory = property (lambda self: self.__directory)
@@ -47,10 +49,16 @@ class Source (Module):
         else:
             return self.__path
 
-    def compile ( self ):
+    def compile ( self, **kwargs ):
         if self.__compiled is not None:
             return
-        self.__compiled = self.__compiler (self, directory=self.__directory)
+        if self.__failure is not None:
+            raise self.__failure
+        try:
+            self.__compiled = self.__compiler (self, directory=self.__directory, **kwargs)
+        except CompilationError as error:
+            self.__failure = error
+            raise
 
     def run ( self, *args, **kwargs ):
         self.compile ()
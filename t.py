@@ -19,24 +19,83 @@
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+import os
 import sys
+import time
 import argparse
-
-from tlib import Color, Error, Log
-
+import contextlib
+import itertools
+
+
+class Startup:
+    """ timings of startup stages, reported with --profile-startup """
+    def __init__ ( self ):
+        self.__last = time.perf_counter ()
+        self.__stages = []
+        try:  # time spent by interpreter before us, precision is clock tick
+            with open ('/proc/self/stat', 'r') as f:
+                ticks = int (f.read ().rsplit (')', 1)[1].split ()[19])
+            started = ticks / os.sysconf (os.sysconf_names['SC_CLK_TCK'])
+            with open ('/proc/uptime', 'r') as f:
+                uptime = float (f.read ().split ()[0])
+            self.__stages.append (('interpreter', max (0.0, uptime - started)))
+        except (OSError, ValueError, IndexError):
+            pass
+
+    def __call__ ( self, stage ):
+        now = time.perf_counter ()
+        self.__stages.append ((stage, now - self.__last))
+        self.__last = now
+
+    def report ( self, log ):
+        for stage, duration in self.__stages:
+            log ('startup: %-20s %7.1f ms' % (stage, duration * 1000))
+        total = sum (duration for stage, duration in self.__stages)
+        log ('startup: %-20s %7.1f ms' % ('total', total * 1000))
+
+
+startup = Startup ()
+from tlib import Color, Error, Jobserver, Log, Workers
+startup ('import tlib')
 import heuristic
-import help
-from wolf import wolf_export
+startup ('import heuristic')
+from cache import CompilationCache
+from compilers import CompilationError
+from discovery import Discovery
+from generator import ExternalGenerator
+from metadata import Metadata
+from source import Source
 from invoker import runner_choose
 from settings import Settings
+startup ('import rest')
 
 
 class T:
-    def __init__ ( self, *, log_policy ):
+    def __init__ (
+        self, *, log_policy, jobs=1, pin=False, cache=True,
+        pipeline=False, checker_server=False, profile=False
+    ):
         self.__log = Log (policy=log_policy)
+        self.__jobs = jobs
+        self.__pin = pin
+        self.__pipeline = pipeline
+        self.__checker_server = checker_server
+        self.__profile = profile
+        self.__jobserver = None
+        directory_cache = os.path.join (
+            os.environ.get ('XDG_CACHE_HOME', os.path.expanduser ('~/.cache')), 't.py'
+        )
         self.__configuration = heuristic.Configuration (
             testlib_checker_path = lambda checker: "/home/burunduk3/source/testlib/checkers/%s.cpp" % checker,
+            compilation_cache = CompilationCache (
+                os.path.join (directory_cache, 'compiled'),
+                size = 1 << 30
+            ) if cache else None,
         t=self)
+        self.__discovery = Discovery (
+            os.path.join (directory_cache, 'problems.json') if cache else None, jobs=jobs
+        )
+        self.__metadata = Metadata (os.path.join (directory_cache, 'problems') if cache else None)
         self.__runner = None
         self.__defaults = Settings (
             limit_time = 5.0,
@@ -50,6 +109,8 @@ class T:
     log = property (lambda self: self.__log)
     configuration = property (lambda self: self.__configuration)
     compilers = property (lambda self: self.__configuration.compilers)
+    discovery = property (lambda self: self.__discovery)
+    metadata = property (lambda self: self.__metadata)
 
     def error ( self, message, *, cls=Error ):
         return cls (message, t=self)
@@ -60,35 +121,227 @@ class T:
 
     def run_prepare ( self ):
         if self.__runner is None:
-            self.__runner =  runner_choose (t=self) (t=self)
+            self.__runner = runner_choose (t=self)
 
     def run ( self, *args, **kwargs ):
         self.run_prepare ()
         return self.__runner.run (*args, **kwargs)
 
+    jobs = property (lambda self: self.__jobs)
+    pipeline = property (lambda self: self.__pipeline)
+    checker_server = property (lambda self: self.__checker_server)
+    profile = property (lambda self: self.__profile)
+
+    def jobserver_prepare ( self ):
+        if self.__jobserver is None:
+            self.__jobserver = Jobserver (self.__jobs)
+        return self.__jobserver
+
+    def workers ( self, directory ):
+        return Workers (directory, self.__jobs, pin=self.__pin, jobserver=self.__jobserver, t=self)
+
 
 
 
 class API:
-    def __init__ ( self, *, arguments ):
+    def __init__ ( self, *, arguments, problems=None ):
+        """ problems: problems kept open between calls (server.Problems), None to reopen them """
         self.__arguments = arguments
-        self.__t = T (log_policy=arguments.log_policy)
+        self.__problems = problems
+        self.__t = T (
+            log_policy=arguments.log_policy, jobs=arguments.jobs, pin=arguments.pin,
+            cache=arguments.cache, pipeline=arguments.pipeline,
+            checker_server=arguments.checker_server, profile=arguments.profile
+        )
         self.__heuristics = heuristic.Heuristics (arguments=self.__arguments, t=self.__t)
 
-        self.problem_build = (self.__target_problem, None, self.__problem_build)
-        self.problem_clean = (self.__target_problem, None, self.__problem_clean)
-        self.solution_check = (self.__target_problem, self.__option_solution, self.__solution_check)
+        nothing = lambda problem, values: []
+        self.problem_build = (
+            self.__target_problem, None, self.__problem_build, self.__sources_build
+        )
+        self.problem_clean = (
+            self.__target_problem, None, self.__problem_clean, nothing
+        )
+        self.solution_check = (
+            self.__target_problem, self.__option_solution, self.__solution_check,
+            self.__sources_check
+        )
+        self.solution_matrix = (
+            self.__target_problem, self.__option_solutions, self.__solution_matrix,
+            self.__sources_matrix
+        )
+        self.stress = (
+            self.__target_problem, self.__option_stress, self.__stress, self.__sources_stress
+        )
+        self.solution_profile = (
+            self.__target_problem, self.__option_profile, self.__solution_profile, nothing
+        )
 
     error = property (lambda self: self.__t.error)
+    log = property (lambda self: self.__t.log)
+    jobs = property (lambda self: self.__t.jobs)
+
+    def compile ( self, sources ):
+        """ compile all given sources in parallel, failures are reported but not raised """
+        self.__t.run_prepare ()
+        unique = {}
+        duplicates = []
+        for source in sources:
+            if not isinstance (source, Source) or source.executable is not None:
+                continue
+            key = (source.directory, source.path)
+            if key not in unique:
+                unique[key] = source
+            elif unique[key] is not source:
+                duplicates.append (source)  # same binary, don't build it twice at once
+        def compile ( slot, source ):
+            try:
+                source.compile (capture=True)
+            except CompilationError as error:
+                return error
+            return None
+        sources = list (unique.values ())
+        with contextlib.closing (self.__t.workers (None).map (compile, sources)) as results:
+            for source, error in zip (sources, results):
+                if error is not None:
+                    self.__t.log.error (error)
+        for source in duplicates:
+            try:
+                source.compile ()
+            except CompilationError:
+                pass
+
+    def execute ( self, action, target, values ):
+        target.info ()
+        if values is None:
+            action (target)
+        else:
+            for value in values:
+                action (target, value)
+
+    def execute_concurrent ( self, action, plan, sources ):
+        """
+            execute action for every target in its own process (so they don't share cwd),
+            jobs of all targets share global budget, sources of target are compiled there too,
+            output of target is printed at once when it's done
+        """
+        import selectors  # only for concurrent mode
+        jobserver = self.__t.jobserver_prepare ()
+        selector = selectors.DefaultSelector ()
+        children = {}
+        failed = []
+        plan = iter (plan)
+        pending = next (plan, None)
+        try:
+            while True:
+                stop = failed and not self.__arguments.keep_going
+                while pending is not None and not stop:
+                    token = jobserver.acquire (block=False)
+                    if token is None:
+                        break
+                    fd, pid = self.__fork (action, sources, *pending, token)
+                    children[fd] = (pid, pending[0], [], token)
+                    selector.register (fd, selectors.EVENT_READ, fd)
+                    pending = next (plan, None)
+                if not children and (pending is None or stop):
+                    break
+                waiting = pending is not None and not stop
+                if waiting:
+                    selector.register (jobserver.fileno (), selectors.EVENT_READ, None)
+                for key, events in selector.select ():
+                    if key.data is None:
+                        continue  # some token is free, try to start next target
+                    pid, target, chunks, token = children[key.fd]
+                    data = os.read (key.fd, 1 << 16)
+                    if data:
+                        chunks.append (data)
+                        continue
+                    selector.unregister (key.fd)
+                    os.close (key.fd)
+                    del children[key.fd]
+                    pid, status = os.waitpid (pid, 0)
+                    sys.stdout.buffer.write (b''.join (chunks))
+                    sys.stdout.flush ()
+                    jobserver.release (token)
+                    if os.waitstatus_to_exitcode (status):
+                        failed.append (target)
+                if waiting:
+                    selector.unregister (jobserver.fileno ())
+        finally:
+            selector.close ()
+        if failed:
+            raise self.error ("failed: %s" % ', '.join (str (target) for target in failed))
+
+    def __fork ( self, action, sources, target, values, token ):
+        """ token: jobserver token acquired for child, its first job (and cpu) goes with it """
+        read, write = os.pipe ()
+        sys.stdout.flush ()
+        sys.stderr.flush ()
+        pid = os.fork ()
+        if pid != 0:
+            os.close (write)
+            return read, pid
+        import traceback
+        code = 0
+        try:
+            os.close (read)
+            os.dup2 (write, 1)
+            os.dup2 (write, 2)
+            os.close (write)
+            self.__t.jobserver_prepare ().forked (token)
+            self.compile (sources (target, values or []))
+            self.execute (action, target, values)
+        except Error as error:
+            error.log ()
+            code = 1
+        except KeyboardInterrupt:
+            code = 2
+        except BaseException:
+            traceback.print_exc ()
+            code = 1
+        finally:
+            sys.stdout.flush ()
+            sys.stderr.flush ()
+            os._exit (code)
+
+    def __sources_build ( self, problem, options ):
+        generator = problem.generator
+        return [
+            generator.source if isinstance (generator, ExternalGenerator) else None,
+            problem.validator,
+            problem.solution_model,
+            problem.interactor,
+            problem.checker
+        ]
+
+    def __sources_check ( self, problem, solutions ):
+        return [problem.checker, problem.interactor] + solutions
+
+    def __sources_matrix ( self, problem, values ):
+        return [problem.checker, problem.interactor] + [
+            solution for solutions in values for solution in solutions
+        ]
+
+    def __sources_stress ( self, problem, values ):
+        return [problem.checker, problem.interactor] + [
+            source for sources in values for source in sources
+        ]
 
     def __target_problem ( self ):
         if self.__arguments.recursive:
             yield from self.__heuristics.problem_search ()
-        else:
+        elif self.__problems is None:
             yield self.__heuristics.problem_open ()
+        else:
+            path = os.path.abspath ('.')
+            problem = self.__problems.get (path)
+            if problem is None:
+                problem = self.__heuristics.problem_open ()
+                self.__problems.put (path, problem)
+            yield problem
 
     def __problem_build ( self, problem ):
-        problem.build ()
+        problem.build (keep_going=self.__arguments.keep_going)
         if problem.solution_model is None:
             self.__t.log.warning ('no model solution')
         elif not self.__solution_check (problem, problem.solution_model):
@@ -103,23 +356,98 @@ class API:
             self.__t.log (solution, ': ', Color.GREEN if verdict else Color.RED, verdict, Color.DEFAULT, " [%.2fs, %.2fMiB] " % (verdict.peak_time, verdict.peak_memory / 2**20), verdict.comment)
         return verdict
 
+    def __solution_matrix ( self, problem, solutions ):
+        verdicts, matrix = problem.solution_matrix (solutions, self.__arguments.keep_going)
+        for solution, verdict in zip (solutions, verdicts):
+            self.__t.log (
+                solution, ': ', Color.GREEN if verdict else Color.RED, verdict, Color.DEFAULT,
+                " [%.2fs, %.2fMiB] " % (verdict.peak_time, verdict.peak_memory / 2**20),
+                verdict.comment
+            )
+        failed = [str (solution) for solution, verdict in zip (solutions, verdicts) if not verdict]
+        if failed and self.__t.log.policy is not Log.BRIEF:
+            self.__t.log.warning ('failed: %s' % ', '.join (failed))
+
+    def __option_solutions ( self, options, *, target ):
+        """ all given solutions at once, all solutions of problem if none given """
+        defaults = self.__heuristics.defaults (target.defaults)
+        if not options:
+            yield self.__heuristics.solutions_search (target, defaults=defaults)
+            return
+        solutions = [
+            self.__heuristics.solution_open (option, problem=target, defaults=defaults)
+            for option in options
+        ]
+        del options[:]
+        yield solutions
+
     def __option_solution ( self, options, *, target ):
         while len (options):
             option = options.pop ()
             yield self.__heuristics.solution_open (option, problem=target, defaults=self.__heuristics.defaults (target.defaults))
 
 
-    # def __stress ( self, problem, arguments ):
-    #     try:
-    #         generator, solution = arguments[:2]
-    #     except ValueError as error:
-    #         raise Error ("usage: t.py stress <generator> <solution>") from error
-    #     generator, solution = [heuristic.source_find (x) for x in (generator, solution)]
-    #     r = True
-    #     while r:
-    #         r = check_problem (problem, solution=solution, tests=[
-    #             Test.generate (generator, problem=problem, name='<stress>')
-    #         ], quiet=True, t=self )
+    def __stress ( self, problem, sources ):
+        generator, solution, model = sources
+        seed = self.__arguments.seed
+        if self.__arguments.iterations is None:
+            seeds = itertools.count (seed)
+        else:
+            seeds = range (seed, seed + self.__arguments.iterations)
+        failure = problem.stress (generator, solution, model, seeds)
+        if failure is None:
+            self.__t.log (
+                solution, ': ', Color.GREEN, 'OK', Color.DEFAULT, ' [%d tests]' % len (seeds)
+            )
+            return
+        seed, verdict, path = failure
+        self.__t.log (
+            solution, ': ', Color.RED, str (verdict).split ('/')[0], Color.DEFAULT,
+            ' [seed: %d, test: %s] ' % (seed, path), verdict.comment
+        )
+        raise self.__t.error ("stress failed: %s" % solution)
+
+    def __option_stress ( self, options, *, target ):
+        """ generator, solution and model solution (default: model solution of problem) """
+        if not 2 <= len (options) <= 3:
+            raise self.__t.error ("usage: t.py stress <generator> <solution> [<model solution>]")
+        defaults = self.__heuristics.defaults (target.defaults)
+        sources = [
+            self.__heuristics.solution_open (option, problem=target, defaults=defaults)
+            for option in options
+        ]
+        del options[:]
+        if len (sources) == 2:
+            if target.solution_model is None:
+                raise self.__t.error ("no model solution")
+            sources.append (target.solution_model)
+        yield sources
+
+    def __solution_profile ( self, problem, value ):
+        solution, test = value
+        series = problem.profile (solution, test)
+        if self.__arguments.export is not None:
+            try:
+                series.export (self.__arguments.export)
+            except ValueError as error:
+                raise self.__t.error (str (error)) from None
+            self.__t.log ('%s on test %s: exported to %s' % (
+                series.solution, series.test, self.__arguments.export
+            ))
+            return
+        self.__t.log ('%s on test %s: %s' % (series.solution, series.test, series.result))
+        for line in series.render ():
+            self.__t.log (line, prefix=False)
+
+    def __option_profile ( self, options, *, target ):
+        """ solution and test, profile is recorded by check or matrix with --profile """
+        if len (options) != 2:
+            raise self.__t.error ("usage: t.py solution:profile <solution> <test>")
+        defaults = self.__heuristics.defaults (target.defaults)
+        solution = self.__heuristics.solution_open (options[0], problem=target, defaults=defaults)
+        test = options[1]
+        del options[:]
+        yield solution, test
 
     # def __tests ( self, problem, *arguments ):
     #     tests_export (problem)
@@ -151,13 +479,36 @@ class API:
     #     }[par])
 
 
-def main ():
+def parser_create ():
     parser = argparse.ArgumentParser (description='t.py: programming contest problem utility')
     parser.add_argument ('--recursive', '-r', dest='recursive', action='store_true', default=False)
     parser.add_argument ('--brief', '-b', dest='log_policy', action='store_const', const=Log.BRIEF, default=Log.DEFAULT)
     parser.add_argument ('--verbose', '-v', dest='log_policy', action='store_const', const=Log.VERBOSE, default=Log.DEFAULT)
     parser.add_argument ('--keep-going', '-k', dest='keep_going', action='store_true', default=False) # check on all tests
     parser.add_argument ('--keep-tests', '-t', dest='keep_tests', action='store_true', default=False) # remove tests on clean
+    parser.add_argument ('--jobs', '-j', dest='jobs', type=int, default=1) # run tests in parallel
+    # pin every job to its own cpu
+    parser.add_argument ('--pin', dest='pin', action='store_true', default=False)
+    # run checker while next test runs
+    parser.add_argument ('--pipeline', dest='pipeline', action='store_true', default=False)
+    # start checker once, see checker.CheckerServer
+    parser.add_argument (
+        '--checker-server', dest='checker_server', action='store_true', default=False
+    )
+    # don't use compilation cache and problem caches
+    parser.add_argument ('--no-cache', dest='cache', action='store_false', default=True)
+    # record resource usage of solutions over time, see usage.Series
+    parser.add_argument ('--profile', dest='profile', action='store_true', default=False)
+    # file for solution:profile output (.json or .csv) instead of table
+    parser.add_argument ('--export', dest='export', default=None)
+    # show where startup time goes
+    parser.add_argument (
+        '--profile-startup', dest='profile_startup', action='store_true', default=False
+    )
+    parser.add_argument ('--socket', dest='socket', default=None) # where serve listens
+    parser.add_argument ('--seed', dest='seed', type=int, default=1) # first seed for stress
+    # number of stress tests, endless by default
+    parser.add_argument ('--iterations', dest='iterations', type=int, default=None)
     parser.add_argument ('--checker', dest='checker', default=None)
     parser.add_argument ('--limit-time', dest='limit_time', default=None)
     parser.add_argument ('--limit-idle', dest='limit_idle', default=None)
@@ -165,15 +516,72 @@ def main ():
     parser.add_argument ('--filename-input', dest='filename_input', default=None)
     parser.add_argument ('--filename-output', dest='filename_output', default=None)
     parser.add_argument (dest='commands', nargs='+')
+    return parser
+
+
+def serve ( parser, arguments ):
+    """
+        keep t.py running and execute commands sent by client.py: imports, compilers,
+        caches and opened problems survive between commands
+    """
+    import server
+    import signal
+    import traceback
+    apis = {}
+    def execute ( argv ):
+        try:
+            arguments = parser.parse_args (argv)
+        except SystemExit as exit:
+            return exit.code
+        # everything but commands goes to API, colors depend on client's terminal
+        key = tuple (sorted (
+            (name, value) for name, value in vars (arguments).items () if name != 'commands'
+        ))
+        key += (sys.stdout.isatty (),)
+        if key not in apis:
+            apis[key] = API (arguments=arguments, problems=daemon.problems ())
+        api = apis[key]
+        try:
+            run (api, arguments)
+        except Error as error:
+            error.log ()
+            return 1
+        except Exception:
+            traceback.print_exc ()
+            return 1
+        return 0
+    log = Log (policy=arguments.log_policy)
+    daemon = server.Server (arguments.socket or server.socket_default (), execute)
+    if not daemon.watching:
+        log.warning ('inotify is not available, problems are opened on every command')
+    signal.signal (signal.SIGTERM, lambda signum, frame: sys.exit (0))  # remove socket on kill
+    try:
+        daemon.serve ()
+    except OSError as error:
+        log.fatal (error)
+        sys.exit (1)
+
+
+def main ():
+    parser = parser_create ()
     arguments = parser.parse_args ()
+    startup ('arguments')
+    if arguments.commands == ['serve']:
+        return serve (parser, arguments)
 
     # platform.prepare ()
     # heuristic.AutoGenerator.register (t=tpy)
     # languages = heuristic.compilers_configure ( configuration, tpy )
     # tpy.set_languages (languages)
     api = API (arguments=arguments)
+    startup ('configuration')
+    if arguments.profile_startup:
+        startup.report (api.log)
+    run (api, arguments)
+
 
-    commands = arguments.commands
+def run ( api, arguments ):
+    commands = list (arguments.commands)
     while len (commands):
         command = commands.pop (0)
         # aliases
@@ -181,25 +589,45 @@ def main ():
             'build': 'problem:build',
             'clean': 'problem:clean',
             'check': 'solution:check',
+            'matrix': 'solution:matrix',
+            'profile': 'solution:profile',
             # 'tests': '???',
         }.get (command, command)
         
         try:
-            targets, options, action = {
+            targets, options, action, sources = {
                 'problem:build': api.problem_build,
                 'problem:clean': api.problem_clean,
                 'solution:check': api.solution_check,
+                'solution:matrix': api.solution_matrix,
+                'solution:profile': api.solution_profile,
+                'stress': api.stress,
             }[command]
         except KeyError:
             raise api.error ("unknown command: '%s'" % command) from None
         try:
-            for target in targets ():
-                target.info ()
-                if options is None:
-                    action (target)
-                else:
-                    for option in options (commands, target=target):
-                        action (target, option)
+            if api.jobs == 1:
+                plan = (
+                    (target, None if options is None else options (commands, target=target))
+                    for target in targets ()
+                )
+            else:
+                plan = [
+                    (target, None if options is None else list (options (commands, target=target)))
+                    for target in targets ()
+                ]
+            if api.jobs > 1 and arguments.recursive:
+                # every target resolves and compiles its sources in own child, its output is whole
+                api.execute_concurrent (action, plan, sources)
+            else:
+                if api.jobs > 1:
+                    # all sources are known before the first run, so compile them at once
+                    api.compile ([
+                        source for target, values in plan
+                        for source in sources (target, values or [])
+                    ])
+                for target, values in plan:
+                    api.execute (action, target, values)
         except NotImplementedError as error:
             raise api.error ("not implemented: " + str (error)) from None
 
@@ -6,6 +6,10 @@ class Test:
         self.__answer = None
 
     path = property (lambda self: self.__path)
+
+    def __str__ ( self ):
+        return self.__path
+
     answer = property (lambda self: self.__answer)
     @answer.setter
     def answer ( self, value ):
@@ -0,0 +1,51 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert (0, os.path.dirname (os.path.dirname (os.path.abspath (__file__))))
+
+from tlib import Error
+
+
+class Log:
+    """ log which keeps warnings for checks """
+    def __init__ ( self ):
+        self.warnings = []
+
+    def warning ( self, *message ):
+        self.warnings.append (' '.join (str (x) for x in message))
+
+
+class T:
+    """ smallest t for modules under test """
+    def __init__ ( self ):
+        self.log = Log ()
+
+    def error ( self, message, *, cls=Error ):
+        return cls (message, t=self)
+
+
+@pytest.fixture
+def t ():
+    return T ()
@@ -0,0 +1,113 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import pytest
+
+import comparators
+from comparators import COMPARATORS, FAIL, OK, PE, WA
+
+
+# checker, output, answer -> exit code and comment of testlib's checker; None is missing file
+CASES = [
+    ('wcmp', b'a b\n', b'a  b', OK, '2 tokens'),
+    ('wcmp', b'abc', b'abc\n', OK, '"abc"'),
+    ('wcmp', b'', b'', OK, '0 tokens'),
+    ('wcmp', b'a b', b'a c', WA, "2nd words differ - expected: 'c', found: 'b'"),
+    ('wcmp', b'a b c', b'a b', WA, 'Participant output contains extra tokens'),
+    ('wcmp', b'a', b'a b', WA, 'Unexpected EOF in the participants output'),
+    ('lcmp', b'a  b\nc\n', b'a b\nc', OK, '2 lines'),
+    ('lcmp', b'abc\n', b'abc\n\n', OK, "single line: 'abc'"),
+    ('lcmp', b'a\nb\n', b'a\nc\n', WA, "2nd lines differ - expected: 'c', found: 'b'"),
+    ('lcmp', b'a\n', b'a\nb\n', PE, 'Unexpected end of file - string expected'),
+    ('ncmp', b'1 2 3', b'1\n2\n3\n', OK, '3 number(s): "1 2 3"'),
+    ('ncmp', b'', b'', OK, '0 number(s): ""'),
+    ('ncmp', b'0 1 2 3 4 5', b'0 1 2 3 4 5', OK, '6 numbers'),
+    ('ncmp', b'1 5', b'1 4', WA, "2nd numbers differ - expected: '4', found: '5'"),
+    ('ncmp', b'1 2 3', b'1 2', WA,
+        'Output contains longer sequence [length = 3], but answer contains 2 elements'),
+    ('ncmp', b'1 2', b'1 2 3', WA,
+        'Answer contains longer sequence [length = 3], but output contains 2 elements'),
+    ('ncmp', b'', b'1', WA,
+        'Answer contains longer sequence [length = 1], but output contains 0 elements'),
+    ('ncmp', b'1', b'1 2 3 4', WA,
+        'Answer contains longer sequence [length = 4], but output contains 1 elements'),
+    ('ncmp', b'1 x', b'1', PE, 'Expected int64, but "x" found'),
+    ('ncmp', b'01', b'1', PE, 'Expected int64, but "01" found'),
+    ('ncmp', b'0', b'0', OK, '1 number(s): "0"'),
+    ('ncmp', b'-0', b'0', PE, 'Expected int64, but "-0" found'),
+    ('ncmp', b'+5', b'5', PE, 'Expected int64, but "+5" found'),
+    ('ncmp', b'- 5', b'-5', PE, 'Expected int64, but "-" found'),
+    ('ncmp', b'1-2', b'1', PE, 'Expected int64, but "1-2" found'),
+    ('ncmp', b'1 x', b'1 2', PE, 'Expected int64, but "x" found'),
+    ('ncmp', b'9223372036854775807', b'9223372036854775807', OK,
+        '1 number(s): "9223372036854775807"'),
+    ('ncmp', b'-9223372036854775808', b'-9223372036854775808', OK,
+        '1 number(s): "-9223372036854775808"'),
+    ('ncmp', b'9223372036854775808', b'1', PE, 'Expected int64, but "9223372036854775808" found'),
+    ('ncmp', b'-9223372036854775809', b'1', PE, 'Expected int64, but "-9223372036854775809" found'),
+    ('ncmp', b'1', b'01', FAIL, 'Expected int64, but "01" found'),
+    ('rcmp6', b'1.0000001', b'1', OK, "found '1.000000', expected '1.000000', error '0.000000'"),
+    ('rcmp6', b'1 2.5e0 .5', b'1 2.5 0.5', OK, '3 numbers'),
+    ('rcmp6', b'1.1', b'1', WA,
+        "1st numbers differ - expected: '1.000000', found: '1.100000', error = '0.100000'"),
+    ('rcmp6', b'1e', b'1', PE, 'Expected double, but "1e" found'),
+    ('rcmp6', b'nan', b'1', PE, 'Expected double, but "nan" found'),
+    ('rcmp6', b'inf', b'1', PE, 'Expected double, but "inf" found'),
+    ('rcmp6', b'1', b'nan', FAIL, 'Expected double, but "nan" found'),
+    ('rcmp6', b'1 2', b'1', PE, 'Extra information in the output file'),
+    ('rcmp6', b'1', b'1 2', PE, 'Unexpected end of file - double expected'),
+    ('rcmp4', b'1.00005', b'1', OK, "found '1.0001', expected '1.0000', error '0.0001'"),
+    ('rcmp9', b'1.000001', b'1', WA,
+        "1st numbers differ - expected: '1.0000000000', found: '1.0000010000', "
+        "error = '0.0000010000'"),
+    ('ncmp', None, b'1', PE, 'Output file not found: "{output}"'),
+    ('ncmp', b'1', None, FAIL, 'File not found: "{answer}"'),
+    ('lcmp', None, b'1', PE, 'Output file not found: "{output}"'),
+]
+
+
+def files ( tmp_path, output, answer ):
+    paths = {'output': str (tmp_path / 'output'), 'answer': str (tmp_path / 'answer')}
+    for name, data in ('output', output), ('answer', answer):
+        if data is not None:
+            with open (paths[name], 'wb') as f:
+                f.write (data)
+    return paths
+
+
+@pytest.mark.parametrize ('name, output, answer, code, comment', CASES)
+def test_comparator ( tmp_path, name, output, answer, code, comment ):
+    paths = files (tmp_path, output, answer)
+    result = COMPARATORS[name] ('input', paths['output'], paths['answer'])
+    assert result == (code, comment.format (**paths))
+
+
+@pytest.mark.parametrize ('name', ['wcmp', 'ncmp', 'rcmp6'])
+@pytest.mark.parametrize ('block, count', [(1, 300), (7, 300), (comparators.Stream.BLOCK, 200000)])
+def test_block_boundary ( tmp_path, monkeypatch, name, block, count ):
+    """ tokens crossing boundary of block are never cut (200000 tokens is over 1 MiB) """
+    monkeypatch.setattr (comparators.Stream, 'BLOCK', block)
+    tokens = [b'%d' % (i * 7919 % 1000003) for i in range (count)]
+    paths = files (tmp_path, b' '.join (tokens), b'\n'.join (tokens) + b'\n')
+    assert COMPARATORS[name] ('input', paths['output'], paths['answer'])[0] == OK
+    output, answer = b' '.join (tokens + [b'1000004']), b'\n'.join (tokens + [b'2000005'])
+    paths = files (tmp_path, output, answer + b'\n')
+    code, comment = COMPARATORS[name] ('input', paths['output'], paths['answer'])
+    assert code == WA and comment.startswith ('%d%s ' % (count + 1, comparators.ending (count + 1)))
@@ -0,0 +1,69 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+
+import os
+import shutil
+
+import pytest
+
+from cache import CompilationCache
+from heuristic import Configuration
+from invoker import runner_choose
+from source import Source
+from tlib import Error, Log
+
+
+class T:
+    """ t which really compiles and runs, with compilation cache in given directory """
+    def __init__ ( self, directory ):
+        self.log = Log (policy=Log.DEFAULT)
+        self.configuration = Configuration (
+            compilation_cache=CompilationCache (directory, size=1 << 20), t=self
+        )
+        self.compilers = self.configuration.compilers
+        self.__runner = None
+
+    def error ( self, message, *, cls=Error ):
+        return cls (message, t=self)
+
+    def run ( self, *args, **kwargs ):
+        if self.__runner is None:
+            self.__runner = runner_choose (t=self)
+        return self.__runner.run (*args, **kwargs)
+
+
+@pytest.mark.skipif (shutil.which ('g++') is None, reason="no g++")
+def test_compile_cached ( tmp_path, capsys ):
+    """ source with system include is compiled once, then binary comes from cache """
+    t = T (str (tmp_path / 'cache'))
+    path = str (tmp_path / 'hello.cpp')
+    with open (path, 'w') as f:
+        f.write ('#include <cstdio>\nint main () { printf ("hello\\n"); }\n')
+    for attempt in range (2):
+        source = Source (path, t.compilers['c++.gcc'], t=t)
+        source.compile ()
+        assert os.path.isfile (str (tmp_path / 'hello'))
+        result = source.run ([], stdout=str (tmp_path / 'output'))
+        assert result
+        with open (str (tmp_path / 'output')) as f:
+            assert f.read () == 'hello\n'
+        os.remove (str (tmp_path / 'hello'))
+        assert ('(cached)' in capsys.readouterr ().out) == (attempt == 1)
@@ -0,0 +1,65 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import os
+
+from invoker import advanced, cgroup, runner_choose
+
+
+def cgroup_fake ( path, *, controllers='memory pids', writable=True ):
+    """ directory which looks like delegated cgroup v2 subtree with us inside """
+    os.makedirs (path, exist_ok=True)
+    with open (os.path.join (path, 'cgroup.controllers'), 'w') as f:
+        f.write (controllers + '\n')
+    with open (os.path.join (path, 'cgroup.procs'), 'w') as f:
+        f.write ('%d\n' % os.getpid ())
+    if writable:
+        open (os.path.join (path, 'cgroup.subtree_control'), 'w').close ()
+    else:  # passes access check, but can't be written, like subtree_control of foreign cgroup
+        os.mkdir (os.path.join (path, 'cgroup.subtree_control'))
+    return str (path)
+
+
+def test_cgroup_unavailable ( t, tmp_path, monkeypatch ):
+    monkeypatch.setenv ('T_CGROUP', cgroup_fake (tmp_path, controllers='cpu'))
+    assert not cgroup.available ()
+    runner = runner_choose (t)
+    assert type (runner) is advanced.Runner
+    assert not any (warning.startswith ('cgroup') for warning in t.log.warnings)
+
+
+def test_cgroup_available ( t, tmp_path, monkeypatch ):
+    monkeypatch.setenv ('T_CGROUP', cgroup_fake (tmp_path))
+    assert cgroup.available ()
+    runner = runner_choose (t)
+    assert type (runner) is cgroup.Runner
+    # we have moved ourselves out of the way and enabled controllers for runs
+    with open (tmp_path / 'supervisor' / 'cgroup.procs') as f:
+        assert f.read () == '0'
+    with open (tmp_path / 'cgroup.subtree_control') as f:
+        assert f.read () == '+memory +pids'
+
+
+def test_cgroup_partially_delegated ( t, tmp_path, monkeypatch ):
+    monkeypatch.setenv ('T_CGROUP', cgroup_fake (tmp_path, writable=False))
+    assert cgroup.available ()
+    runner = runner_choose (t)
+    assert type (runner) is advanced.Runner
+    assert any (warning.startswith ('cgroup runner failed:') for warning in t.log.warnings)
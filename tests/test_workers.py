@@ -0,0 +1,48 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import contextlib
+import os
+
+from tlib import Jobserver, Workers
+
+
+def test_jobserver_tokens ():
+    jobserver = Jobserver (3)
+    tokens = [jobserver.acquire () for i in range (3)]
+    assert sorted (tokens) == [0, 1, 2]
+    assert jobserver.acquire (block=False) is None
+    jobserver.release (tokens[1])
+    assert jobserver.acquire (block=False) == tokens[1]
+
+
+def test_workers_pin_by_token ( t, tmp_path, monkeypatch ):
+    monkeypatch.setattr (os, 'sched_getaffinity', lambda pid: {0, 1, 2, 3})
+    jobserver = Jobserver (4)
+    # jobs of other process (e.g. concurrent problem) hold tokens 0 and 1
+    held = [jobserver.acquire (), jobserver.acquire ()]
+    assert held == [0, 1]
+    workers = Workers (str (tmp_path), 2, pin=True, jobserver=jobserver, t=t)
+    with contextlib.closing (workers.map (lambda slot, item: slot.cpu, range (16))) as results:
+        cpus = set (results)
+    assert cpus <= {2, 3}
+    for token in held:
+        jobserver.release (token)
+    assert sorted (jobserver.acquire () for i in range (4)) == [0, 1, 2, 3]
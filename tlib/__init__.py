@@ -39,12 +39,16 @@ class Module:
 
     _log = property (lambda self: self._t.log)
     _run = property (lambda self: self._t.run)
+    _workers = property (lambda self: self._t.workers)
     _error = property (lambda self: self._t.error)
     _ensure = property (lambda self: self._t.ensure)
     _configuration = property (lambda self: self._t.configuration)
     _compilers = property (lambda self: self._t.compilers)
 
 
+from .common import stage
+from .jobserver import Jobserver
 from .log import Color, Log
+from .workers import Workers
 
 
@@ -0,0 +1,92 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import select
+import threading
+
+
+class Jobserver:
+    """
+        make-like job budget shared between processes: pipe holds free tokens,
+        every process owns one more implicit token, token is needed to run a job;
+        tokens are numbered 0..jobs-1 (modulo 256), so job may pick its cpu by token
+    """
+    def __init__ ( self, jobs ):
+        self.__read, self.__write = os.pipe ()
+        # all readers wait with select, so nobody blocks when somebody else takes token first
+        os.set_blocking (self.__read, False)
+        os.write (self.__write, bytes (token % 256 for token in range (1, jobs)))
+        self.__wakeup = None
+        self.forked (0)
+
+    def fileno ( self ):
+        return self.__read
+
+    def forked ( self, token ):
+        """ call in child process: token acquired for it by parent becomes its implicit one """
+        if self.__wakeup is not None:
+            for fd in self.__wakeup:
+                os.close (fd)
+        # threads waiting for token are woken up through this pipe when implicit token is released
+        self.__wakeup = os.pipe ()
+        for fd in self.__wakeup:
+            os.set_blocking (fd, False)
+        self.__implicit = token  # None while it's taken
+        self.__token = token
+        self.__waiting = 0
+        self.__lock = threading.Lock ()
+
+    def acquire ( self, block=True ):
+        """ number of acquired token, None if there is no free token and block is off """
+        wakeup = self.__wakeup[0]
+        while True:
+            with self.__lock:
+                if self.__implicit is not None:
+                    token, self.__implicit = self.__implicit, None
+                    return token
+                self.__waiting += 1
+            try:
+                ready = select.select ([self.__read, wakeup], [], [], None if block else 0)[0]
+            finally:
+                with self.__lock:
+                    self.__waiting -= 1
+            if wakeup in ready:
+                try:
+                    os.read (wakeup, 1 << 10)
+                except BlockingIOError:
+                    pass
+            if self.__read in ready:
+                try:
+                    token = os.read (self.__read, 1)
+                    if token:
+                        return token[0]
+                except BlockingIOError:
+                    pass
+            if not block:
+                return None
+
+    def release ( self, token ):
+        with self.__lock:
+            if self.__implicit is None and token == self.__token:
+                self.__implicit = token
+                if self.__waiting:
+                    os.write (self.__wakeup[1], b'+')
+                return
+        os.write (self.__write, bytes ([token]))
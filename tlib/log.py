@@ -61,8 +61,9 @@ class VT100:
             Color.BRIGHTWHITE: '\x1b[37;1m',
         }
 
-    def print ( self, *message, **kwargs ):
-        print (''.join ([self.__convert.get (x, str (x)) for x in message]), **kwargs)
+    def print ( self, *message, end='\n', **kwargs ):
+        # single write, so lines from different threads don't mix
+        print (''.join ([self.__convert.get (x, str (x)) for x in message]) + end, end='', **kwargs)
 
 
 class NoTTY:
@@ -87,8 +88,9 @@ class NoTTY:
             Color.BRIGHTWHITE,
         }
 
-    def print ( self, *message, **kwargs ):
-        print (''.join ([str (x) for x in message if not x in self.__colors]), **kwargs)
+    def print ( self, *message, end='\n', **kwargs ):
+        line = ''.join ([str (x) for x in message if not x in self.__colors])
+        print (line + end, end='', **kwargs)
 
 
 class Log:
@@ -0,0 +1,170 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import collections
+import itertools
+import os
+import queue
+import threading
+
+from . import Module
+
+
+class Slot:
+    def __init__ ( self, index, directory, cpu=None ):
+        self.__index = index
+        self.__directory = directory
+        self.__cpu = cpu
+
+    index = property (lambda self: self.__index)
+    directory = property (lambda self: self.__directory)
+    cpu = property (lambda self: self.__cpu)
+
+
+class Workers (Module):
+    """
+        pool of workers, every worker owns private scratch directory
+        (and cpu, if pinning is enabled); with jobserver every job also needs its token,
+        and cpu is chosen by token, so jobs of all processes sharing jobserver get different cpus
+    """
+    def __init__ ( self, directory, jobs=1, *args, pin=False, jobserver=None, **kwargs ):
+        super (Workers, self).__init__ (*args, **kwargs)
+        self.__jobs = max (1, jobs)
+        self.__jobserver = jobserver
+        cpus = [None] * self.__jobs
+        self.__cpus = None
+        if pin:
+            cpus = sorted (os.sched_getaffinity (0))
+            if len (cpus) < self.__jobs:
+                self._log.warning (
+                    "only %d cpus available for %d jobs, some of them will share cpu"
+                    % (len (cpus), self.__jobs)
+                )
+            self.__cpus = cpus
+        if directory is None or self.__jobs == 1:
+            directories = [directory] * self.__jobs
+        else:
+            directories = [os.path.join (directory, str (i)) for i in range (self.__jobs)]
+        self.__slots = [Slot (i, x, cpus[i % len (cpus)]) for i, x in enumerate (directories)]
+
+    jobs = property (lambda self: self.__jobs)
+    slots = property (lambda self: self.__slots)
+
+    def prepare ( self ):
+        for slot in self.__slots:
+            if slot.directory is not None:
+                os.makedirs (slot.directory, exist_ok=True)
+
+    def __acquire ( self, slots ):
+        """ returns (slot, token) """
+        if self.__jobserver is None:
+            return slots.get (), None
+        token = self.__jobserver.acquire ()
+        slot = slots.get ()
+        if self.__cpus is not None:
+            slot = Slot (slot.index, slot.directory, self.__cpus[token % len (self.__cpus)])
+        return slot, token
+
+    def __release ( self, slots, slot, token ):
+        slots.put (self.__slots[slot.index])
+        if self.__jobserver is not None:
+            self.__jobserver.release (token)
+
+    def map ( self, function, items ):
+        """
+            calls function (slot, item) for every item, yields results in order of items;
+            closing generator cancels all work which is not started yet
+        """
+        self.prepare ()
+        if self.__jobs == 1:
+            slot, = self.__slots
+            for item in items:
+                yield function (slot, item)
+            return
+        import concurrent.futures  # not needed for single job
+        slots = queue.Queue ()
+        for slot in self.__slots:
+            slots.put (slot)
+        def task ( item ):
+            slot, token = self.__acquire (slots)
+            try:
+                return function (slot, item)
+            finally:
+                self.__release (slots, slot, token)
+        executor = concurrent.futures.ThreadPoolExecutor (max_workers=self.__jobs)
+        try:
+            # items are taken only a bit ahead of results, so they may be endless
+            items = iter (items)
+            futures = collections.deque (
+                executor.submit (task, item) for item in itertools.islice (items, 2 * self.__jobs)
+            )
+            while futures:
+                future = futures.popleft ()
+                for item in itertools.islice (items, 1):
+                    futures.append (executor.submit (task, item))
+                yield future.result ()
+        finally:
+            executor.shutdown (wait=True, cancel_futures=True)
+
+    def pipeline ( self, first, second, items, depth=None, discard=None ):
+        """
+            like map, but calls second (item, value) for value = first (slot, item)
+            in separate stage, so first stage for next items runs while second stage
+            for previous ones is still working; at most depth values (default: jobs)
+            wait for second stage, first stage waits for them; after generator is closed
+            second stage is skipped, discard (item, value) is called instead
+        """
+        import concurrent.futures
+        self.prepare ()
+        depth = self.__jobs if depth is None else max (1, depth)
+        slots = queue.Queue ()
+        for slot in self.__slots:
+            slots.put (slot)
+        pending = threading.Semaphore (depth)
+        cancelled = threading.Event ()
+        # every submitted task holds semaphore, so there is always free thread for it
+        finishers = concurrent.futures.ThreadPoolExecutor (max_workers=depth)
+        def finish ( item, value ):
+            try:
+                if not cancelled.is_set ():
+                    return second (item, value)
+                if discard is not None:
+                    discard (item, value)
+                return None
+            finally:
+                pending.release ()
+        def task ( item ):
+            if cancelled.is_set ():
+                return None
+            slot, token = self.__acquire (slots)
+            try:
+                value = first (slot, item)
+            finally:
+                self.__release (slots, slot, token)
+            pending.acquire ()
+            return finishers.submit (finish, item, value)
+        executor = concurrent.futures.ThreadPoolExecutor (max_workers=self.__jobs)
+        try:
+            futures = [executor.submit (task, item) for item in items]
+            for future in futures:
+                yield future.result ().result ()
+        finally:
+            cancelled.set ()
+            executor.shutdown (wait=True, cancel_futures=True)
+            finishers.shutdown (wait=True)
@@ -0,0 +1,124 @@
+#
+#    t.py: utility for contest problem development
+#    Copyright (C) 2009-2017 Oleg Davydov
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import csv
+import io
+import json
+import os
+
+
+class Series:
+    """
+        resource usage of single run sampled over time (see invoker.advanced.Process),
+        every sample is (wall time, cpu time, rss, vsz, bytes read, bytes written);
+        bytes are counted by read/write syscalls, so page cache doesn't hide them,
+        values which weren't available (e.g. after process has exited) are None
+    """
+    FIELDS = ('time', 'cpu', 'rss', 'vsz', 'read', 'write')
+    ROWS = 40  # max rows for render, long series are thinned out
+
+    def __init__ ( self, samples, *, solution=None, test=None, result=None ):
+        self.__samples = [tuple (sample) for sample in samples]
+        self.__solution = solution
+        self.__test = test
+        self.__result = result
+
+    samples = property (lambda self: self.__samples)
+    solution = property (lambda self: self.__solution)
+    test = property (lambda self: self.__test)
+    result = property (lambda self: self.__result)
+
+    @classmethod
+    def load ( cls, path ):
+        with open (path, 'r') as f:
+            data = json.load (f)
+        return cls (
+            data['samples'], solution=data.get ('solution'),
+            test=data.get ('test'), result=data.get ('result')
+        )
+
+    def save ( self, path ):
+        os.makedirs (os.path.dirname (path) or '.', exist_ok=True)
+        with open (path + '.new', 'w') as f:
+            f.write (self.json ())
+        os.replace (path + '.new', path)
+
+    def export ( self, path ):
+        """ write series to file, format is chosen by suffix: .json or .csv """
+        formats = {'.json': lambda: self.json () + '\n', '.csv': self.csv}
+        suffix = os.path.splitext (path)[1]
+        if suffix not in formats:
+            raise ValueError ("unknown format: '%s', expected .json or .csv" % path)
+        with open (path, 'w') as f:
+            f.write (formats[suffix] ())
+
+    def json ( self ):
+        return json.dumps ({
+            'solution': self.__solution,
+            'test': self.__test,
+            'result': self.__result,
+            'fields': list (Series.FIELDS),
+            'samples': self.__samples,
+        })
+
+    def csv ( self ):
+        result = io.StringIO ()
+        writer = csv.writer (result, lineterminator='\n')
+        writer.writerow (Series.FIELDS)
+        writer.writerows ([('' if x is None else x) for x in sample] for sample in self.__samples)
+        return result.getvalue ()
+
+    def render ( self ):
+        """ human-readable table: how cpu, memory and i/o changed during the run """
+        def value ( x, format, scale=1 ):
+            return '%9s' % '-' if x is None else format % (x / scale)
+        samples = self.__samples
+        if len (samples) > Series.ROWS:
+            step = (len (samples) - 1) / (Series.ROWS - 1)
+            samples = [samples[round (i * step)] for i in range (Series.ROWS)]
+        rss_peak = max ((sample[2] for sample in samples if sample[2] is not None), default=0)
+        lines = ['%8s %8s %5s %9s %9s %9s %9s' % (
+            'time', 'cpu', 'cpu%', 'rss MiB', 'vsz MiB', 'read KiB', 'write KiB'
+        )]
+        previous = (0.0, 0.0)
+        for sample in samples:
+            time, cpu, rss, vsz, read, write = sample
+            load = (cpu - previous[1]) / (time - previous[0]) * 100 if time > previous[0] else 0.0
+            previous = (time, cpu)
+            line = '%7.3fs %7.3fs %4.0f%% %s %s %s %s %s' % (
+                time, cpu, load,
+                value (rss, '%9.2f', 2**20), value (vsz, '%9.2f', 2**20),
+                value (read, '%9.0f', 2**10), value (write, '%9.0f', 2**10),
+                '' if rss is None or not rss_peak else '#' * round (20 * rss / rss_peak)
+            )
+            lines.append (line.rstrip ())
+        if self.__samples:
+            time, cpu = self.__samples[-1][:2]
+            known = lambda index: [x[index] for x in self.__samples if x[index] is not None]
+            summary = (
+                'total: %.3fs, cpu %.3fs (%.0f%%), rss peak %.2fMiB, '
+                'read %.2fMiB, written %.2fMiB'
+            )
+            lines.append (summary % (
+                time, cpu, cpu / time * 100 if time else 0.0,
+                max (known (2), default=0) / 2**20,
+                max (known (4), default=0) / 2**20, max (known (5), default=0) / 2**20
+            ))
+        return lines
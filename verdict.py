@@ -41,7 +41,7 @@ class Verdict:
 
     @classmethod
     def ce ( cls ):
-        return cls ("CE", False)
+        return cls ("CE", False, peak_time=0.0, peak_memory=0)
 
     @classmethod
     def fail_solution ( cls, test, result, **kwargs ):
@@ -61,6 +61,6 @@ class Verdict:
         return cls ("JE/%d" % test, False, comment, **kwargs)
 
     @classmethod
-    def ok ( cls, **kwargs ):
-        return cls ("OK", True, **kwargs)
+    def ok ( cls, comment='', **kwargs ):
+        return cls ("OK", True, comment, **kwargs)
 